@@ -3,15 +3,39 @@
 """
 
 import os
+import sys
 import json
 import time
 import subprocess
+import tempfile
 import threading
+import uuid
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 from enum import Enum
 
+# 导入同目录模块
+sys.path.insert(0, str(Path(__file__).parent))
+from transcribe_pipeline import StagePipeline
+from whisper_engine import write_segments_txt, write_segments_srt
+from transcribe_backends import (
+    TranscribeBackend, BACKENDS, BACKEND_CONFIG, create_backend, available_backends,
+    benchmark_backends, load_benchmark, select_backend
+)
+from audio_stream import AudioStream
+from audio_chunker import ChunkedTranscriber, probe_duration, extract_chunk
+from task_store import TaskStore
+from transcript_cache import TranscriptCache, canonical_video_id, SUBTITLE_MODEL
+from metadata_cache import MetadataCache
+from subtitle_resolver import SubtitleResolver
+from process_control import popen_group, ProcessWatch
+from thread_planner import ThreadPlanner, CoreSlots, available_cpus, limit_threads
+from model_cascade import draft_model_for, refine
+from audio_preprocess import OffsetMap, preprocess_audio
+from audio_fingerprint import FingerprintIndex, fingerprint_available, fingerprint_audio
+from playlist_expander import is_playlist_url, flat_extract, new_entries
+
 # 任务状态
 class TaskStatus(Enum):
     PENDING = "pending"
@@ -20,7 +44,88 @@ class TaskStatus(Enum):
     FORMATTING = "formatting"
     COMPLETED = "completed"
     FAILED = "failed"
-
+    CANCELLED = "cancelled"
+
+
+# 已结束的状态
+FINISHED_STATUSES = (TaskStatus.COMPLETED.value, TaskStatus.FAILED.value, TaskStatus.CANCELLED.value)
+# 未结束（排队或处理中）的状态
+ACTIVE_STATUSES = tuple(status.value for status in TaskStatus if status.value not in FINISHED_STATUSES)
+
+
+class TaskCancelled(Exception):
+    """任务已被取消，当前阶段中止"""
+
+
+# 流水线配置
+PIPELINE_CONFIG = {
+    "metadata_workers": 4,       # 获取视频元数据（网络 IO）
+    "probe_workers": 4,          # 字幕探测（网络 IO）
+    "download_workers": 2,       # 音频下载（带宽）
+    "transcribe_workers": None,  # Whisper 转录（CPU），None 表示按核数预算推算
+    "fingerprint_workers": 1,    # 音频指纹去重
+    "preview_workers": 1,        # 小模型预览（CPU）
+    "preprocess_workers": 1,     # 去静音 / 加速（ffmpeg）
+    "format_workers": 1,         # 生成文档
+    "metadata_ttl": 3600,        # 元数据缓存有效期（秒）
+    "audio_profile": "native",   # 音频获取方式，见 AUDIO_PROFILES
+    "subtitle_deadline": 20,     # 并发探测字幕的最长等待时间（秒）
+    # 各平台（output_formatter.detect_platform 的结果）在网络阶段的并发上限，"*" 为默认值
+    "platform_limits": {"B站": 2, "YouTube": 4, "*": 4},
+    "short_video_seconds": 600,  # 不超过该时长的视频在同优先级内插队，0 表示关闭
+    # 无字幕时边下载边转录，音频不落盘（需要支持流式的转录后端：inprocess / ctranslate2）
+    "streaming": False,
+    # 转录前去掉长静音、按 audio_preprocess.PREPROCESS_CONFIG["speed"] 加速语音，
+    # 时间戳按偏移表换回原始音频时间
+    "preprocess": False,
+    # 下载后计算音频开头的指纹，与已转录的音频（如跨平台搬运）相同时复用其转录结果
+    # （需要 numpy 和 ffmpeg；提交时 use_cache=False 则只记录指纹不复用）
+    "dedupe": True,
+    "cpu_budget": None,          # 转录可用核数，None 表示按 CPU 亲和性和 cgroup 配额检测
+    "whisper_threads": None,     # 每个 Whisper 的线程数，None 表示与并发数一起按实测吞吐规划
+    "explore_thread_plans": False,  # 为 True 时先依次试用实测样本不足的 并发数 × 线程数 组合
+}
+
+# 音频获取方式：yt-dlp 参数（Whisper 自己会再解码并重采样到 16kHz，没必要先转 MP3）
+AUDIO_PROFILES = {
+    # 原始容器直出（Opus/AAC），不重新编码
+    "native": ['-f', 'bestaudio/best', '-x'],
+    # 码率最低的纯音频流，省带宽
+    "lowest": ['-f', 'worstaudio/bestaudio/worst', '-x'],
+    # 直接转成 Whisper 所需的 16kHz 单声道 PCM / FLAC
+    "pcm16k": ['-f', 'worstaudio/bestaudio/worst', '-x', '--audio-format', 'wav',
+               '--postprocessor-args', 'ExtractAudio:-ac 1 -ar 16000'],
+    "flac16k": ['-f', 'worstaudio/bestaudio/worst', '-x', '--audio-format', 'flac',
+                '--postprocessor-args', 'ExtractAudio:-ac 1 -ar 16000'],
+    # 旧行为：转码为 MP3
+    "mp3": ['-x', '--audio-format', 'mp3'],
+}
+
+# Whisper 引擎配置
+WHISPER_CONFIG = {
+    # cli: 调用 whisper 命令；inprocess: 常驻进程内 openai-whisper；ctranslate2: faster-whisper int8 量化；
+    # auto: 按 --benchmark-backends 的结果选满足精度下限的最快后端，没有测试结果时依次尝试 inprocess、ctranslate2、cli
+    "backend": "auto",
+    "max_wer": 0.15,             # 自动选择后端时允许的最大词错误率
+    "max_resident_models": 2,    # 常驻内存的模型数（LRU 淘汰）
+    "device": None,              # None 表示由 whisper 自动选择
+    "chunk_min_duration": 1200,  # 超过该时长（秒）的音频在静音处切块并行转录，0 表示关闭
+    "chunk_seconds": 600,        # 每块目标时长（秒）
+    "chunk_workers": None,       # 切块转录进程数，None 表示与转录并发数相同（同时转录的块数受转录名额限制）
+    # 短音频批量转录：排队中不超过 batch_clip_seconds 的音频（同模型、同语言）凑成一批，
+    # 在同一个已加载的模型上一次前向解码（需要支持批量的后端，如 inprocess）；0 表示不批量
+    "batch_clip_seconds": 90,
+    "batch_size": 8,
+    # 级联：先用 CASCADE_CONFIG["draft_model"] 出初稿，只把低置信度片段交给请求的模型重新解码
+    # （需要常驻模型的后端；cli 后端每个片段都要重新加载模型，不做级联）
+    "cascade": False,
+    # 预览：先用小模型转录开头（或均匀抽样的几个窗口），完整转录随后以较低优先级进行
+    "preview_model": "tiny",
+    "preview_seconds": 300,      # 预览开头的时长（秒）
+    "preview_windows": 0,        # >0 时改为在全片均匀抽取这么多个窗口
+    "preview_window_seconds": 60,
+    "preview_priority_offset": 10,  # 预览完成后完整转录的优先级数值增加量（越大越靠后）
+}
 
 class AsyncTranscriber:
     """异步转录器"""
@@ -28,31 +133,82 @@ class AsyncTranscriber:
     def __init__(
         self,
         output_dir: str = "~/Documents/video-transcribe",
-        task_dir: str = "~/.cache/video-transcribe/tasks"
+        task_dir: str = "~/.cache/video-transcribe/tasks",
+        db_path: Optional[str] = None,
+        pipeline_config: Optional[Dict[str, Any]] = None,
+        whisper_config: Optional[Dict[str, Any]] = None
     ):
         self.output_dir = Path(output_dir).expanduser()
         self.task_dir = Path(task_dir).expanduser()
+        self.pipeline_config = {**PIPELINE_CONFIG, **(pipeline_config or {})}
+        self.whisper_config = {**WHISPER_CONFIG, **(whisper_config or {})}
 
         # 确保目录存在
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.task_dir.mkdir(parents=True, exist_ok=True)
 
+        # 任务信息存 SQLite，任务目录只放音频、字幕等产物
+        self.store = TaskStore(db_path or self.task_dir.parent / "tasks.db")
+        self.store.import_task_dirs(self.task_dir)
+        self.cache = TranscriptCache(self.task_dir.parent / "transcript_cache.db")
+        self.fingerprints = FingerprintIndex(self.task_dir.parent / "fingerprints.db")
+        self.metadata_cache = MetadataCache(
+            self.task_dir.parent / "metadata", ttl=self.pipeline_config["metadata_ttl"]
+        )
+        self.subtitle_resolver = SubtitleResolver(
+            self.task_dir.parent / "subtitle_stats.json",
+            deadline=self.pipeline_config["subtitle_deadline"],
+        )
+        self.thread_planner = ThreadPlanner(self.task_dir.parent / "thread_stats.json")
+
+        self._lock = threading.RLock()
+        # 任务状态变化时通知 wait_task / wait_any
+        self._status_changed = threading.Condition()
+        self._pipeline: Optional[StagePipeline] = None
+        self._backends: Dict[str, TranscribeBackend] = {}
+        self._chunker: Optional[ChunkedTranscriber] = None
+        # 自动选择后端用：已安装的后端（首次选择时检测一次）和基准测试结果（文件更新时重新读取）
+        self._available_backends: Optional[list] = None
+        self._benchmark: Tuple[Optional[float], list] = (None, [])
+        # 正在运行子进程的任务的取消信号
+        self._cancel_events: Dict[str, threading.Event] = {}
+        # 各任务当前阶段的开始时间 (datetime, time.time())
+        self._stage_clocks: Dict[str, Tuple[datetime, float]] = {}
+        self._plan_transcribe_workers()
+
     def _get_task_path(self, task_id: str) -> Path:
         return self.task_dir / task_id
 
-    def create_task(self, url: str, platform: str = "auto") -> str:
-        """创建转录任务，返回任务ID"""
-        task_id = f"transcribe_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        task_path = self._get_task_path(task_id)
-        task_path.mkdir(exist_ok=True)
+    def create_task(
+        self,
+        url: str,
+        platform: str = "auto",
+        model: str = "small",
+        language: str = "zh",
+        output_format: str = "markdown",
+        use_cache: bool = True
+    ) -> str:
+        """
+        创建转录任务，立即返回任务ID
+
+        视频元数据由流水线第一阶段获取；命中转录缓存时任务直接完成
+        """
+        task_id, task_path = self._new_task_dir()
+
+        video_id = canonical_video_id(url)
+        cached = None
+        if use_cache and video_id:
+            cached = self.cache.get(video_id, model, language)
 
-        # 获取视频信息
-        video_info = self._get_video_info(url)
+        # 命中缓存时复用缓存里的视频信息，否则由元数据阶段填充
+        video_info = cached["video_info"] if cached else {}
 
         # 保存任务信息
         task_info = {
             "task_id": task_id,
             "url": url,
+            "video_id": video_id,
+            "use_cache": use_cache,
             "platform": platform,
             "video_info": video_info,
             "status": TaskStatus.PENDING.value,
@@ -63,49 +219,94 @@ class AsyncTranscriber:
             "error": None
         }
 
-        (task_path / "info.json").write_text(
-            json.dumps(task_info, indent=2, ensure_ascii=False)
-        )
+        self._save_info(task_id, task_info)
+
+        if cached:
+            self._complete_from_cache(task_id, url, cached, output_format)
 
         return task_id
 
-    def _get_video_info(self, url: str) -> Dict[str, Any]:
-        """获取视频基本信息"""
-        try:
-            result = subprocess.run(
-                ['yt-dlp', '--dump-json', '--no-playlist', url],
-                capture_output=True, text=True, timeout=60
+    def _new_task_dir(self):
+        """生成不冲突的任务ID并创建任务目录（同一秒内多次提交也不会重复）"""
+        while True:
+            task_id = f"transcribe_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+            task_path = self._get_task_path(task_id)
+            try:
+                task_path.mkdir()
+                return task_id, task_path
+            except FileExistsError:
+                continue
+
+    def _complete_from_cache(
+        self,
+        task_id: str,
+        url: str,
+        cached: Dict[str, Any],
+        output_format: str
+    ):
+        """用缓存的转录结果直接完成任务；缓存的输出文件格式与请求的不同时按请求的格式重新生成"""
+        output_path = cached.get("output_path")
+        suffix = {"markdown": ".md", "txt": ".txt", "json": ".json", "srt": ".srt"}.get(output_format, ".txt")
+        if not output_path or not Path(output_path).exists() or Path(output_path).suffix != suffix:
+            txt_path = self._get_task_path(task_id) / "cached.txt"
+            txt_path.write_text(cached["transcript"], encoding="utf-8")
+            output_path = self._generate_output(
+                self._get_task_path(task_id), task_id, url,
+                cached["video_info"], txt_path, output_format
             )
-            if result.returncode == 0:
-                data = json.loads(result.stdout)
-                return {
-                    "title": data.get("title", ""),
-                    "uploader": data.get("uploader", ""),
-                    "uploader_id": data.get("uploader_id", ""),
-                    "channel": data.get("channel", ""),
-                    "duration": data.get("duration", 0),
-                    "thumbnail": data.get("thumbnail", ""),
-                    "description": data.get("description", "")[:500],
-                    "upload_date": data.get("upload_date", ""),  # YYYYMMDD 格式
-                }
-        except Exception:
-            pass
-        return {}
 
-    def _try_get_subtitles(self, url: str, language: str = "zh") -> Optional[str]:
-        """尝试获取平台字幕，成功返回文本，失败返回 None"""
+        self._update_info(
+            task_id,
+            status=TaskStatus.COMPLETED.value,
+            message=f"转录完成（缓存：{cached['model']}）",
+            progress=100,
+            output_path=str(output_path),
+        )
+
+    @staticmethod
+    def _summarize_video_info(data: Dict[str, Any]) -> Dict[str, Any]:
+        """从 yt-dlp 元数据中提取需要保存的字段"""
+        if not data:
+            return {}
+        return {
+            "title": data.get("title", ""),
+            "uploader": data.get("uploader", ""),
+            "uploader_id": data.get("uploader_id", ""),
+            "channel": data.get("channel", ""),
+            "duration": data.get("duration", 0),
+            "thumbnail": data.get("thumbnail", ""),
+            "description": (data.get("description") or "")[:500],
+            "upload_date": data.get("upload_date", ""),  # YYYYMMDD 格式
+        }
+
+    def _try_get_subtitles(
+        self,
+        url: str,
+        language: str = "zh",
+        info_json: Optional[str] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        并发尝试所有适用的字幕来源，返回 (字幕文本, 来源名)，都失败返回 (None, None)
+        """
         url_lower = url.lower()
+        sources = []
 
-        # YouTube: 用 youtube-transcript-api
+        # YouTube: youtube-transcript-api
         if "youtube.com" in url_lower or "youtu.be" in url_lower:
-            return self._get_youtube_subtitles(url, language)
+            sources.append(("transcript_api", lambda cancel: self._get_youtube_subtitles(url, language)))
 
-        # B站: 用 yt-dlp 提取字幕
+        # B站: 播放器 API
         if "bilibili.com" in url_lower:
-            return self._get_bilibili_subtitles(url, language)
+            sources.append(("bilibili_api", lambda cancel: self._get_bilibili_subtitles(url, language, cancel)))
+
+        # 所有平台: yt-dlp 人工字幕 / 自动字幕
+        sources.append(("ytdlp_manual", lambda cancel: self._get_ytdlp_subtitles(
+            url, language, auto=False, info_json=info_json, cancel=cancel)))
+        sources.append(("ytdlp_auto", lambda cancel: self._get_ytdlp_subtitles(
+            url, language, auto=True, info_json=info_json, cancel=cancel)))
 
-        # 其他平台: 用 yt-dlp 通用字幕提取
-        return self._get_ytdlp_subtitles(url, language)
+        from output_formatter import detect_platform
+        return self.subtitle_resolver.resolve(detect_platform(url), sources)
 
     def _get_youtube_subtitles(self, url: str, language: str) -> Optional[str]:
         """YouTube 字幕提取"""
@@ -131,8 +332,14 @@ class AsyncTranscriber:
         except Exception:
             return None
 
-    def _get_bilibili_subtitles(self, url: str, language: str) -> Optional[str]:
-        """B站字幕提取（通过 API）"""
+    def _get_bilibili_subtitles(
+        self,
+        url: str,
+        language: str,
+        cancel: Optional[threading.Event] = None
+    ) -> Optional[str]:
+        """B站字幕提取（通过 API），每次请求前检查是否已被取消"""
+        cancelled = lambda: cancel is not None and cancel.is_set()
         try:
             import re
             import requests
@@ -151,7 +358,7 @@ class AsyncTranscriber:
             data = resp.json().get('data', {})
             cid = data.get('cid')
             aid = data.get('aid')
-            if not cid or not aid:
+            if not cid or not aid or cancelled():
                 return None
 
             # 获取字幕列表
@@ -174,7 +381,7 @@ class AsyncTranscriber:
             if not sub_url and subtitles:
                 sub_url = subtitles[0].get('subtitle_url')
 
-            if not sub_url:
+            if not sub_url or cancelled():
                 return None
 
             # 下载字幕内容
@@ -190,20 +397,40 @@ class AsyncTranscriber:
         except Exception:
             return None
 
-    def _get_ytdlp_subtitles(self, url: str, language: str) -> Optional[str]:
-        """通用 yt-dlp 字幕提取"""
+    def _get_ytdlp_subtitles(
+        self,
+        url: str,
+        language: str,
+        auto: bool = False,
+        info_json: Optional[str] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Optional[str]:
+        """通用 yt-dlp 字幕提取（auto=True 取自动生成字幕，否则取人工字幕）"""
         try:
             import tempfile
             with tempfile.TemporaryDirectory() as tmpdir:
-                result = subprocess.run([
-                    'yt-dlp', '--write-sub', '--write-auto-sub',
+                if info_json and Path(info_json).exists():
+                    source = ['--load-info-json', info_json]
+                else:
+                    source = [url]
+                proc = subprocess.Popen([
+                    'yt-dlp', '--write-auto-sub' if auto else '--write-sub',
                     '--sub-lang', f'{language},zh,en',
                     '--sub-format', 'vtt/srt/best',
                     '--skip-download',
                     '-o', os.path.join(tmpdir, 'sub'),
                     '--quiet', '--no-warnings',
-                    url
-                ], capture_output=True, text=True, timeout=60)
+                    *source
+                ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+                # 等待结束，被取消或超时则结束进程
+                deadline = time.time() + 60
+                while proc.poll() is None:
+                    if (cancel is not None and cancel.is_set()) or time.time() > deadline:
+                        proc.kill()
+                        proc.wait()
+                        return None
+                    time.sleep(0.1)
 
                 # 查找生成的字幕文件
                 import glob
@@ -252,96 +479,970 @@ class AsyncTranscriber:
         task_id: str,
         model: str = "small",
         language: str = "zh",
-        output_format: str = "markdown"  # markdown, txt, json, srt
+        output_format: str = "markdown",  # markdown, txt, json, srt
+        audio_profile: Optional[str] = None,
+        priority: int = 0,
+        preview: bool = False
     ):
-        """后台启动任务"""
-        def run():
-            task_path = self._get_task_path(task_id)
-            info_path = task_path / "info.json"
+        """
+        提交任务到后台流水线（priority 越小越优先）
 
+        preview=True 时下载完成后先生成小模型预览，完整转录降低优先级继续
+        """
+        from output_formatter import detect_platform
+        job = {
+            "task_id": task_id,
+            "model": model,
+            "language": language,
+            "output_format": output_format,
+            "audio_profile": audio_profile or self.pipeline_config["audio_profile"],
+            "priority": priority,
+            "platform": detect_platform(self._load_info(task_id)["url"]),
+            "preview": preview,
+        }
+        # 记录任务参数和所属进程，进程意外退出后可据此恢复
+        self._update_info(
+            task_id,
+            worker_pid=os.getpid(),
+            priority=priority,
+            model=model,
+            platform_name=job["platform"],
+            checkpoint={"stage": None, "next_stage": "metadata", "job": job},
+        )
+        self._get_pipeline().submit(job)
+        return task_id
+
+    def submit_playlist(
+        self,
+        url: str,
+        incremental: bool = False,
+        platform: str = "auto",
+        model: str = "small",
+        language: str = "zh",
+        output_format: str = "markdown",
+        use_cache: bool = True,
+        audio_profile: Optional[str] = None,
+        priority: int = 0,
+        preview: bool = False
+    ) -> Dict[str, Any]:
+        """
+        展开播放列表 / 频道，每个条目提交为独立任务
+
+        incremental=True 时只提交还没同步过的条目（已同步的条目 id 持久化在任务库中，
+        频道和播放列表的新条目在开头还是末尾都能识别）；
+        已在转录缓存中的视频和列表内重复的条目会被跳过。
+        """
+        if incremental:
+            # 已同步的条目按提交时的 URL 记录，同一频道每次用同一链接同步
+            source, entries = new_entries(url, self.store.synced_entries(url))
+        else:
+            source, entries = flat_extract(url)
+
+        submitted, skipped = [], 0
+        seen = set()
+        for entry in entries:
+            video_id = canonical_video_id(entry["url"]) or entry["url"]
+            if video_id in seen:
+                skipped += 1
+                continue
+            seen.add(video_id)
+            if use_cache and self.cache.get(video_id, model, language):
+                skipped += 1
+                continue
+            task_id = self.create_task(entry["url"], platform, model, language, output_format, use_cache)
+            self.start_task(task_id, model, language, output_format, audio_profile, priority, preview)
+            submitted.append(task_id)
+
+        if incremental and entries:
+            self.store.mark_synced(url, [entry["id"] for entry in entries])
+
+        return {
+            "source": source,
+            "entries": len(entries),
+            "submitted": submitted,
+            "skipped": skipped,
+        }
+
+    def _job_priority(self, job: Dict[str, Any]) -> tuple:
+        """
+        流水线排序键：先按 priority，再让短视频插队
+
+        时长由元数据阶段填入 job，未知时按长视频处理
+        """
+        short = self.pipeline_config["short_video_seconds"]
+        duration = job.get("duration") or 0
+        is_short = bool(short) and 0 < duration <= short
+        return (job.get("priority", 0), 0 if is_short else 1)
+
+    def _checkpointed(self, stage: str, handler):
+        """
+        包装阶段处理函数：记录阶段起止时间，阶段完成后保存检查点
+        （job 中记录了已获取的产物路径）
+        """
+        def run(job: Dict[str, Any]) -> Optional[str]:
+            self._stage_clocks[job["task_id"]] = (datetime.now(), time.time())
+            ok = False
+            next_stage = None
+            # 先创建取消信号再开始阶段，阶段内任何时刻取消都能通知到
+            self._cancel_event(job["task_id"])
             try:
-                # 读取任务信息
-                info = json.loads(info_path.read_text())
-                url = info["url"]
-                video_info = info.get("video_info", {})
-
-                # === 阶段0: 检查字幕 ===
-                info["status"] = TaskStatus.DOWNLOADING.value
-                info["message"] = "正在检查字幕..."
-                info["progress"] = 5
-                info_path.write_text(json.dumps(info, indent=2, ensure_ascii=False))
-
-                subtitle_text = self._try_get_subtitles(url, language)
-
-                if subtitle_text:
-                    # 有字幕，直接用，跳过 Whisper
-                    info["message"] = "已获取字幕，跳过语音识别"
-                    info["progress"] = 80
-                    info_path.write_text(json.dumps(info, indent=2, ensure_ascii=False))
-
-                    txt_path = task_path / "subtitle.txt"
-                    txt_path.write_text(subtitle_text, encoding='utf-8')
-                else:
-                    # 无字幕，走 Whisper 流程
-                    # === 阶段1: 下载音频 ===
-                    info["message"] = "无字幕，正在下载音频准备语音识别..."
-                    info["progress"] = 10
-                    info_path.write_text(json.dumps(info, indent=2, ensure_ascii=False))
-
-                    audio_path = task_path / "audio.mp3"
-                    result = subprocess.run([
-                        'yt-dlp', '-x', '--audio-format', 'mp3',
-                        '-o', str(audio_path),
-                        '--quiet', '--no-warnings',
-                        url
-                    ], capture_output=True, text=True, timeout=600)
-
-                    if result.returncode != 0 or not audio_path.exists():
-                        raise Exception(f"下载失败: {result.stderr}")
-
-                    # === 阶段2: Whisper 转录 ===
-                    info["status"] = TaskStatus.TRANSCRIBING.value
-                    info["message"] = "正在语音识别（Whisper）..."
-                    info["progress"] = 30
-                    info_path.write_text(json.dumps(info, indent=2, ensure_ascii=False))
-
-                    txt_path = task_path / "audio.txt"
-                    subprocess.run([
-                        'whisper', str(audio_path),
-                        '--model', model,
-                        '--language', language,
-                        '--output_format', 'txt',
-                        '--output_dir', str(task_path)
-                    ], capture_output=True, text=True, timeout=3600)
-
-                # === 阶段3: 格式化输出 ===
-                info["status"] = TaskStatus.FORMATTING.value
-                info["message"] = "正在生成文档..."
-                info["progress"] = 90
-                info_path.write_text(json.dumps(info, indent=2, ensure_ascii=False))
-
-                # 生成输出文件
-                output_path = self._generate_output(
-                    task_path, task_id, url, video_info, txt_path, output_format
+                next_stage = handler(job)
+                ok = True
+            finally:
+                self._record_stage(stage, job, ok, next_stage)
+            return next_stage
+        return run
+
+    def _checkpointed_batch(self, stage: str, handler):
+        """
+        批处理版的 _checkpointed：批内每个 job 分别记录检查点和阶段耗时
+        （整批耗时按批大小平分，另记 batch_size / batch_seconds）
+        """
+        def run(jobs: list) -> list:
+            clock = (datetime.now(), time.time())
+            for job in jobs:
+                self._stage_clocks[job["task_id"]] = clock
+                self._cancel_event(job["task_id"])
+            try:
+                outcomes = handler(jobs)
+            except Exception as e:
+                outcomes = [e] * len(jobs)
+            for job, outcome in zip(jobs, outcomes):
+                ok = not isinstance(outcome, Exception)
+                self._record_stage(stage, job, ok, outcome if ok else None, len(jobs))
+            return outcomes
+        return run
+
+    def _record_stage(self, stage: str, job: Dict[str, Any], ok: bool, next_stage: Optional[str],
+                      batch_size: int = 1):
+        self._cancel_events.pop(job["task_id"], None)
+        fields = self._stage_timing(stage, job["task_id"], ok, batch_size)
+        if fields is None:
+            # 阶段已在最后一次状态更新中自行记录耗时（见 _stage_format）
+            return
+        if ok and next_stage is not None:
+            fields["checkpoint"] = {"stage": stage, "next_stage": next_stage, "job": job}
+        self._update_info(job["task_id"], **fields)
+
+    def _stage_timing(self, stage: str, task_id: str, ok: bool = True,
+                      batch_size: int = 1) -> Optional[Dict[str, Any]]:
+        """
+        结束当前阶段的计时，返回含 timings 的待更新字段；已结束过返回 None
+
+        批处理时整批耗时按批大小平分，另记 batch_size / batch_seconds
+        """
+        clock = self._stage_clocks.pop(task_id, None)
+        if clock is None:
+            return None
+        started_at, started = clock
+        elapsed = time.time() - started
+        timings = self._load_info(task_id).get("timings", {})
+        timings[stage] = {
+            "started_at": started_at.isoformat(),
+            "ended_at": datetime.now().isoformat(),
+            "seconds": round(elapsed / batch_size, 3),
+            "ok": ok,
+        }
+        if batch_size > 1:
+            timings[stage].update(batch_size=batch_size, batch_seconds=round(elapsed, 3))
+        return {"timings": timings}
+
+    @staticmethod
+    def _pid_alive(pid: Optional[int]) -> bool:
+        if not pid:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def find_interrupted_tasks(self) -> list:
+        """找出所属进程已退出但状态仍未结束的任务"""
+        interrupted = []
+        for status in ACTIVE_STATUSES:
+            for info in self.store.list(status=status):
+                pid = info.get("worker_pid")
+                if pid == os.getpid() or self._pid_alive(pid):
+                    continue
+                interrupted.append(info)
+        return interrupted
+
+    def resume_tasks(self, task_ids: Optional[list] = None) -> list:
+        """
+        从最近的检查点重新排队中断的任务，返回已恢复的任务ID
+
+        已下载的音频、已获取的字幕和转录结果不会重新生成；
+        下载中断的任务由 yt-dlp 续传 .part 文件。
+        """
+        resumed = []
+        for info in self.find_interrupted_tasks():
+            task_id = info["task_id"]
+            if task_ids and task_id not in task_ids:
+                continue
+            checkpoint = info.get("checkpoint")
+            if not checkpoint:
+                # 没有任务参数（旧版任务），无法恢复
+                continue
+
+            job = checkpoint["job"]
+            stage = self._resume_stage(checkpoint["next_stage"], job)
+            status = self._stage_status(stage)
+            self._update_info(
+                task_id,
+                status=status.value,
+                message=f"从检查点恢复（{stage}）",
+                worker_pid=os.getpid(),
+                resumed_count=info.get("resumed_count", 0) + 1,
+            )
+            self._get_pipeline().submit(job, stage)
+            resumed.append(task_id)
+        return resumed
+
+    def _stage_status(self, stage: str) -> TaskStatus:
+        """阶段对应的任务状态：入口阶段为排队，转录之前为下载，转录之后为格式化"""
+        order = self._get_pipeline().stages
+        position, transcribe = order.index(stage), order.index("transcribe")
+        if position == 0:
+            return TaskStatus.PENDING
+        if position < transcribe:
+            return TaskStatus.DOWNLOADING
+        return TaskStatus.TRANSCRIBING if position == transcribe else TaskStatus.FORMATTING
+
+    @staticmethod
+    def _resume_stage(next_stage: str, job: Dict[str, Any]) -> str:
+        """检查点记录的产物丢失时退回到能重新生成它的阶段"""
+        if next_stage == "format" and not Path(job.get("txt_path") or "").is_file():
+            next_stage = "transcribe" if job.get("audio_path") else "probe"
+        if next_stage in ("fingerprint", "preview", "preprocess", "transcribe") and not job.get("stream") \
+                and not Path(job.get("audio_path") or "").is_file():
+            next_stage = "download"
+        return next_stage
+
+    def _get_pipeline(self) -> StagePipeline:
+        """按需创建流水线（首次提交任务时才启动工作线程）"""
+        with self._lock:
+            if self._pipeline is None:
+                cfg = self.pipeline_config
+                self._pipeline = StagePipeline([
+                    ("metadata", self._checkpointed("metadata", self._stage_metadata), cfg["metadata_workers"]),
+                    ("probe", self._checkpointed("probe", self._stage_probe), cfg["probe_workers"]),
+                    ("download", self._checkpointed("download", self._stage_download), cfg["download_workers"]),
+                    ("fingerprint", self._checkpointed("fingerprint", self._stage_fingerprint), cfg["fingerprint_workers"]),
+                    ("preview", self._checkpointed("preview", self._stage_preview), cfg["preview_workers"]),
+                    ("preprocess", self._checkpointed("preprocess", self._stage_preprocess), cfg["preprocess_workers"]),
+                    ("transcribe", self._checkpointed("transcribe", self._stage_transcribe), self._transcribe_workers),
+                    ("format", self._checkpointed("format", self._stage_format), cfg["format_workers"]),
+                ],
+                    on_error=self._fail_task,
+                    priority_key=self._job_priority,
+                    # 网络阶段按平台限流，避免同一平台并发过多触发风控
+                    group_key=lambda job: job.get("platform"),
+                    group_limits=cfg["platform_limits"],
+                    limited_stages=["metadata", "probe", "download"],
+                    batch_stages={"transcribe": (
+                        self._batch_key, self.whisper_config["batch_size"],
+                        self._checkpointed_batch("transcribe", self._stage_transcribe_batch),
+                    )},
+                )
+            return self._pipeline
+
+    def _plan_transcribe_workers(self):
+        """
+        根据核数预算计算转录并发数和每个 Whisper 的线程数
+
+        两者都未配置时由 ThreadPlanner 按实测吞吐选择；并限制数值库线程数，
+        避免多个转录同时占满所有核。转录名额数等于并发数，切块转录的每一块也占一个名额
+        """
+        cfg = self.pipeline_config
+        budget = self._cpu_budget = cfg["cpu_budget"] or available_cpus()
+        if cfg["whisper_threads"]:
+            threads = max(1, min(cfg["whisper_threads"], budget))
+            workers = cfg["transcribe_workers"] or budget // threads
+        elif cfg["transcribe_workers"]:
+            workers = cfg["transcribe_workers"]
+            threads = max(1, budget // workers)
+        else:
+            workers, threads = self.thread_planner.plan(budget, explore=cfg["explore_thread_plans"])
+        # 并发数 × 线程数 不超过核数预算
+        workers = max(1, min(workers, budget // threads))
+        self._transcribe_workers = workers
+        self._whisper_threads = threads
+        self._whisper_slots = CoreSlots(workers)
+        limit_threads(threads)
+
+    def _select_backend(self, model: str) -> str:
+        """该模型使用的转录后端"""
+        backend = self.whisper_config["backend"]
+        if backend != "auto":
+            return backend
+        # 不加锁：可能在流水线锁内调用（_batch_key），重复检测无害
+        if self._available_backends is None:
+            self._available_backends = available_backends()
+        available = self._available_backends
+        selected = select_backend(model, self._load_benchmark(), self.whisper_config["max_wer"], available)
+        if selected:
+            return selected
+        return next((name for name in BACKEND_CONFIG["fallback_order"] if name in available), "cli")
+
+    def _load_benchmark(self) -> list:
+        """基准测试结果（--benchmark-backends 在其他进程中运行，按文件修改时间判断是否重新读取）"""
+        try:
+            mtime = Path(BACKEND_CONFIG["benchmark_path"]).expanduser().stat().st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._benchmark[0]:
+            self._benchmark = (mtime, load_benchmark() if mtime is not None else [])
+        return self._benchmark[1]
+
+    def _get_backend(self, name: str) -> TranscribeBackend:
+        """常驻转录后端（首次使用时创建，模型加载后跨任务复用）"""
+        with self._lock:
+            if name not in self._backends:
+                self._backends[name] = create_backend(
+                    name,
+                    threads=self._whisper_threads,
+                    device=self.whisper_config["device"],
+                    max_models=self.whisper_config["max_resident_models"],
+                )
+            return self._backends[name]
+
+    def _get_chunker(self) -> ChunkedTranscriber:
+        """长音频切块转录用的进程池（首次使用时创建）"""
+        with self._lock:
+            if self._chunker is None:
+                self._chunker = ChunkedTranscriber(
+                    workers=self.whisper_config["chunk_workers"] or self._transcribe_workers,
+                    threads_per_worker=self._whisper_threads,
+                    device=self.whisper_config["device"],
                 )
+            return self._chunker
+
+    def _load_info(self, task_id: str) -> Dict[str, Any]:
+        info = self.store.get(task_id)
+        if info is None:
+            raise KeyError(f"任务不存在: {task_id}")
+        return info
+
+    def _save_info(self, task_id: str, info: Dict[str, Any]):
+        self.store.insert(info)
+
+    def _update_info(self, task_id: str, **fields) -> Dict[str, Any]:
+        """原子地更新任务信息的部分字段（状态变化时唤醒等待者）"""
+        info = self.store.update(task_id, **fields)
+        if "status" in fields:
+            self._notify_status()
+        return info
+
+    def _notify_status(self):
+        with self._status_changed:
+            self._status_changed.notify_all()
+
+    def _update_active(self, task_id: str, **fields) -> Dict[str, Any]:
+        """更新未结束任务的字段；任务已被取消时抛 TaskCancelled，中止当前阶段"""
+        info = self.store.transition(task_id, ACTIVE_STATUSES, **fields)
+        if info is None:
+            raise TaskCancelled(task_id)
+        if "status" in fields:
+            self._notify_status()
+        return info
+
+    def _cancel_event(self, task_id: str) -> threading.Event:
+        """当前阶段的取消信号（阶段开始时创建，结束时清除）"""
+        return self._cancel_events.setdefault(task_id, threading.Event())
+
+    def _fail_task(self, job: Dict[str, Any], error: Exception):
+        """流水线阶段异常时标记任务失败（已取消的任务只清理音频）"""
+        info = self.store.transition(
+            job["task_id"], ACTIVE_STATUSES,
+            status=TaskStatus.FAILED.value,
+            message=f"失败: {str(error)}",
+            error=str(error),
+        )
+        if info is None:
+            self._discard_audio(job["task_id"])
+        else:
+            self._notify_status()
+
+    def cancel_task(self, task_id: str) -> bool:
+        """
+        取消任务：终止正在运行的 yt-dlp / whisper 进程组，删除已下载的音频
+
+        排队中的任务在轮到时直接丢弃，正在运行的阶段尽快中止并让出工作线程。
+        任务已结束返回 False。
+        """
+        info = self.store.transition(
+            task_id, ACTIVE_STATUSES,
+            status=TaskStatus.CANCELLED.value,
+            message="任务已取消",
+            eta_seconds=0,
+        )
+        if info is None:
+            return False
+        event = self._cancel_events.get(task_id)
+        if event is not None:
+            event.set()
+        self._notify_status()
+        self._discard_audio(task_id)
+        return True
+
+    def _discard_audio(self, task_id: str):
+        """删除任务目录下的音频和未下载完的分片（保留已转录的文本）"""
+        task_path = self._get_task_path(task_id)
+        for path in task_path.glob("audio.*"):
+            if path.suffix not in (".txt", ".json", ".srt", ".vtt"):
+                path.unlink(missing_ok=True)
+
+    # === 阶段0: 获取视频信息 ===
+    def _stage_metadata(self, job: Dict[str, Any]) -> Optional[str]:
+        task_id = job["task_id"]
+        info = self.store.transition(
+            task_id, [TaskStatus.PENDING.value],
+            status=TaskStatus.DOWNLOADING.value,
+            message="正在获取视频信息...",
+            progress=2,
+        )
+        if info is None:
+            # 任务已被其他 worker 接手或不再是待处理状态（例如命中缓存已完成）
+            return None
+        self._notify_status()
+
+        info_json = self.metadata_cache.get_or_fetch(info["url"])
+        job["info_json"] = str(info_json) if info_json else None
+        if info_json:
+            video_info = self._summarize_video_info(self.metadata_cache.load(info_json))
+            # 时长决定后续阶段的排队顺序（短视频插队）
+            job["duration"] = video_info.get("duration") or 0
+            self._update_active(task_id, video_info=video_info)
+        return "probe"
+
+    # === 阶段0.5: 检查字幕 ===
+    def _stage_probe(self, job: Dict[str, Any]) -> Optional[str]:
+        task_id = job["task_id"]
+        info = self._update_active(task_id, message="正在检查字幕...", progress=5)
+
+        subtitle_text, subtitle_source = self._try_get_subtitles(
+            info["url"], job["language"], job.get("info_json")
+        )
+        job["subtitle_hit"] = bool(subtitle_text)
+        self._update_active(task_id, subtitle_source=subtitle_source)
+
+        if subtitle_text:
+            # 有字幕，直接用，跳过 Whisper
+            txt_path = self._get_task_path(task_id) / "subtitle.txt"
+            txt_path.write_text(subtitle_text, encoding='utf-8')
+            (self._get_task_path(task_id) / "partial.txt").write_text(
+                subtitle_text.rstrip("\n") + "\n", encoding='utf-8'
+            )
+            job["txt_path"] = str(txt_path)
+            self._update_active(task_id, message="已获取字幕，跳过语音识别", progress=80)
+            return "format"
+
+        # 无字幕，走 Whisper 流程
+        backend = self._select_backend(job["model"])
+        # 预览需要完整的音频文件，不走流式
+        if self.pipeline_config["streaming"] and BACKENDS[backend].supports_stream and not job.get("preview"):
+            job["stream"] = True
+            self._update_active(task_id, message="无字幕，排队边下载边转录...")
+            return "transcribe"
+        self._update_active(task_id, message="无字幕，排队下载音频...")
+        return "download"
+
+    # === 阶段1: 下载音频 ===
+    def _stage_download(self, job: Dict[str, Any]) -> Optional[str]:
+        task_id = job["task_id"]
+        info = self._update_active(
+            task_id,
+            message="无字幕，正在下载音频准备语音识别...",
+            progress=10,
+        )
+
+        source = self._ytdlp_source(info, job)
+        profile = job.get("audio_profile") or self.pipeline_config["audio_profile"]
+        if profile not in AUDIO_PROFILES:
+            raise ValueError(f"未知的音频获取方式: {profile}")
+
+        task_path = self._get_task_path(task_id)
+        # 记录续传状态：上次中断留下的 .part 文件由 yt-dlp --continue 接着下载
+        partial_bytes = sum(p.stat().st_size for p in task_path.glob("audio.*.part"))
+        self._update_active(task_id, download_state={
+            "started_at": datetime.now().isoformat(),
+            "resumed_from_bytes": partial_bytes,
+        })
+
+        started = time.time()
+        proc = popen_group([
+            'yt-dlp', *AUDIO_PROFILES[profile],
+            '--continue', '--part',
+            '-o', str(task_path / "audio.%(ext)s"),
+            '--quiet', '--no-warnings',
+            *source
+        ], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        with ProcessWatch(proc, timeout=600, cancel=self._cancel_event(task_id)) as watch:
+            _, stderr = proc.communicate()
+        download_seconds = time.time() - started
+
+        if watch.reason == "cancelled":
+            raise TaskCancelled(task_id)
+        audio_path = self._find_audio_file(task_path)
+        if proc.returncode != 0 or audio_path is None:
+            raise Exception(f"下载失败: {'超时' if watch.reason == 'timeout' else stderr}")
+
+        self._update_active(task_id, acquisition={
+            "profile": profile,
+            "download_seconds": round(download_seconds, 3),
+            "bytes": audio_path.stat().st_size,
+            "format": audio_path.suffix.lstrip("."),
+            "decode_seconds": None,  # 转录阶段填充
+        })
+        job["audio_path"] = str(audio_path)
+        # 重新下载后之前的预处理结果作废
+        job.pop("preprocess", None)
+        waiting = "生成预览" if job.get("preview") else "转录资源"
+        self._update_active(task_id, message=f"音频已下载，等待{waiting}...", progress=25)
+        if self.pipeline_config["dedupe"] and fingerprint_available():
+            return "fingerprint"
+        return self._after_fingerprint(job)
+
+    def _ytdlp_source(self, info: Dict[str, Any], job: Dict[str, Any]) -> list:
+        """
+        yt-dlp 的输入参数：复用元数据阶段的 info.json，不必再解析一次页面
+        （恢复的任务可能隔了很久，info.json 里的直链过期后改为重新解析）
+        """
+        info_json = job.get("info_json")
+        if info_json and self.metadata_cache.get(info["url"]):
+            return ['--load-info-json', info_json]
+        return [info["url"]]
+
+    @staticmethod
+    def _find_audio_file(task_path: Path) -> Optional[Path]:
+        """找到 yt-dlp 下载的音频文件（扩展名取决于获取方式）"""
+        for path in sorted(task_path.glob("audio.*")):
+            if path.suffix not in (".part", ".ytdl", ".txt", ".json", ".srt", ".vtt", ".tmp"):
+                return path
+        return None
+
+    # === 阶段1.2: 音频指纹去重 ===
+    def _stage_fingerprint(self, job: Dict[str, Any]) -> Optional[str]:
+        task_id = job["task_id"]
+        info = self._update_active(task_id, message="正在比对音频指纹...")
+
+        fingerprint = fingerprint_audio(job["audio_path"])
+        if not len(fingerprint):
+            return self._after_fingerprint(job)
+        video_id = info.get("video_id")
+        duration = info.get("video_info", {}).get("duration") or probe_duration(job["audio_path"])
+        match = self.fingerprints.match(fingerprint, exclude=video_id, duration=duration) \
+            if info.get("use_cache", True) else None
+        if video_id:
+            self.fingerprints.add(video_id, fingerprint, duration)
+
+        # 对方还没有同模型（或字幕）的转录结果时照常转录
+        cached = self.cache.get(match["key"], job["model"], job["language"]) if match else None
+        if not cached:
+            return self._after_fingerprint(job)
+
+        txt_path = self._get_task_path(task_id) / "audio.txt"
+        txt_path.write_text(cached["transcript"], encoding="utf-8")
+        job["txt_path"] = str(txt_path)
+        job["duplicate_of"] = {"video_id": match["key"], "model": cached["model"]}
+        self._update_active(
+            task_id,
+            duplicate_of={**job["duplicate_of"], "bit_error_rate": match["bit_error_rate"],
+                          "offset_seconds": match["offset_seconds"]},
+            message=f"与已转录的 {match['key']} 音频相同，复用其转录结果...",
+            progress=85,
+        )
+        return "format"
+
+    def _after_fingerprint(self, job: Dict[str, Any]) -> str:
+        return "preview" if job.get("preview") else self._before_transcribe()
+
+    # === 阶段1.5: 小模型预览 ===
+    def _stage_preview(self, job: Dict[str, Any]) -> Optional[str]:
+        task_id = job["task_id"]
+        cfg = self.whisper_config
+        info = self._update_active(task_id, message=f"正在生成预览（{cfg['preview_model']} 模型）...")
+
+        duration = info.get("video_info", {}).get("duration") or probe_duration(job["audio_path"])
+        backend = self._get_backend(self._select_backend(cfg["preview_model"]))
+        cancel = self._cancel_event(task_id)
+        spans = self._preview_spans(duration)
+
+        parts = []
+        with tempfile.TemporaryDirectory(prefix="preview_") as tmpdir:
+            for i, (start, end) in enumerate(spans):
+                chunk_path = os.path.join(tmpdir, f"preview_{i:02d}.wav")
+                extract_chunk(job["audio_path"], start, end, chunk_path)
+                # 预览同样占用转录名额，不在核数预算之外另起 Whisper
+                with self._whisper_slots.hold(cancel):
+                    result = backend.transcribe(
+                        chunk_path, model=cfg["preview_model"], language=job["language"], cancel=cancel
+                    )
+                lines = [seg["text"].strip() for seg in result.get("segments", []) if seg["text"].strip()]
+                if len(spans) > 1:
+                    lines.insert(0, f"[{int(start) // 60:02d}:{int(start) % 60:02d}]")
+                parts.append("\n".join(lines))
+
+        preview_path = self._get_task_path(task_id) / "preview.txt"
+        preview_path.write_text("\n\n".join(parts) + "\n", encoding="utf-8")
+
+        # 预览已可用，完整转录让位给其他任务的预览和高优先级任务
+        job["priority"] = job.get("priority", 0) + cfg["preview_priority_offset"]
+        self._update_active(
+            task_id,
+            preview_path=str(preview_path),
+            preview_model=cfg["preview_model"],
+            preview_seconds=round(sum(end - start for start, end in spans), 1),
+            priority=job["priority"],
+            message="预览已生成，等待完整转录...",
+        )
+        return self._before_transcribe()
+
+    def _preview_spans(self, duration: float) -> list:
+        """预览的时间范围：开头 N 秒，或在全片均匀抽取的若干窗口"""
+        cfg = self.whisper_config
+        windows, window = cfg["preview_windows"], cfg["preview_window_seconds"]
+        if windows and duration > windows * window:
+            step = duration / windows
+            return [(i * step, i * step + window) for i in range(windows)]
+        return [(0.0, min(duration, cfg["preview_seconds"]) if duration else cfg["preview_seconds"])]
+
+    def _before_transcribe(self) -> str:
+        """已下载的音频进入转录前的下一阶段"""
+        return "preprocess" if self.pipeline_config["preprocess"] else "transcribe"
+
+    # === 阶段1.6: 去静音 / 加速 ===
+    def _stage_preprocess(self, job: Dict[str, Any]) -> Optional[str]:
+        task_id = job["task_id"]
+        info = self._update_active(task_id, message="正在预处理音频（去除长静音）...")
+
+        started = time.time()
+        dst = self._get_task_path(task_id) / "audio.trimmed.wav"
+        result = preprocess_audio(
+            job["audio_path"], str(dst), duration=info.get("video_info", {}).get("duration")
+        )
+        if result is None:
+            # 静音很少，直接转录原音频
+            self._update_active(task_id, message="音频无需预处理，等待转录资源...")
+            return "transcribe"
+
+        job["preprocess"] = {
+            "source_path": job["audio_path"],
+            "seconds_in": result["seconds_in"],
+            "seconds_out": result["seconds_out"],
+            "offset_map": result["offset_map"],
+        }
+        job["audio_path"] = str(dst)
+        self._update_active(
+            task_id,
+            preprocess={
+                "seconds_in": result["seconds_in"],
+                "seconds_out": result["seconds_out"],
+                "silence_removed": result["silence_removed"],
+                "speed": result["speed"],
+                "seconds": round(time.time() - started, 1),
+            },
+            message=f"音频已预处理（{result['seconds_in']:.0f}s → {result['seconds_out']:.0f}s），等待转录资源...",
+        )
+        return "transcribe"
+
+    # === 阶段2: Whisper 转录 ===
+    def _stage_transcribe(self, job: Dict[str, Any]) -> Optional[str]:
+        task_id = job["task_id"]
+        info = self._update_active(
+            task_id,
+            status=TaskStatus.TRANSCRIBING.value,
+            message="正在语音识别（Whisper）...",
+            progress=30,
+        )
 
-                # === 完成 ===
-                info["status"] = TaskStatus.COMPLETED.value
-                info["message"] = "转录完成" + ("（字幕）" if subtitle_text else "（Whisper）")
-                info["progress"] = 100
-                info["output_path"] = str(output_path)
-                info_path.write_text(json.dumps(info, indent=2, ensure_ascii=False))
+        # 预处理过的音频按处理后的时长计算进度
+        duration = job.get("preprocess", {}).get("seconds_out") \
+            or info.get("video_info", {}).get("duration") \
+            or (0 if job.get("stream") else probe_duration(job["audio_path"]))
+        on_segments = self._make_segment_sink(task_id, duration)
+        backend = self._select_backend(job["model"])
+
+        if job.get("stream"):
+            self._update_active(task_id, message="正在边下载边语音识别（Whisper）...")
+            result = self._transcribe_stream(job, info, backend, on_segments)
+            duration = duration or result.get("duration", 0)
+        elif self._use_cascade(job, backend):
+            result = self._transcribe_cascade(job, backend, duration, on_segments)
+        else:
+            result = self._transcribe_file(job, job["model"], backend, duration, on_segments, record=True)
+        return self._finish_transcribe(job, info, result, duration, backend)
+
+    def _finish_transcribe(self, job, info, result: Dict[str, Any], duration: float, backend: str) -> str:
+        """写出转录文本和字幕，记录音频时长、后端和获取方式"""
+        if job.get("preprocess"):
+            # 去静音 / 加速后的时间戳换回原始音频时间
+            offset_map = OffsetMap.from_dict(job["preprocess"]["offset_map"])
+            result = {**result, "segments": offset_map.remap(result.get("segments", []))}
+            duration = job["preprocess"]["seconds_in"]
+
+        txt_path = self._get_task_path(job["task_id"]) / "audio.txt"
+        write_segments_txt(result, txt_path)
+        write_segments_srt(result, txt_path.with_suffix(".srt"))
+
+        fields = {"audio_seconds": round(duration, 1), "backend": backend}
+        if result.get("batch_size"):
+            fields["batch_size"] = result["batch_size"]
+        if result.get("cascade"):
+            fields["cascade"] = result["cascade"]
+        if job.get("stream"):
+            fields["acquisition"] = {
+                "profile": "stream", "download_seconds": None, "bytes": None,
+                "format": "pcm_s16le", "decode_seconds": None,
+            }
+        elif info.get("acquisition"):
+            # 记录该获取方式下的音频解码耗时
+            fields["acquisition"] = {
+                **info["acquisition"], "decode_seconds": result.get("decode_seconds")
+            }
+        self._update_active(job["task_id"], **fields)
+
+        job["txt_path"] = str(txt_path)
+        return "format"
+
+    def _batch_key(self, job: Dict[str, Any]) -> Optional[tuple]:
+        """
+        可以批量转录的 job 的分组键：同后端、同模型、同语言的已下载短音频；
+        不能批量时返回 None
+        """
+        cfg = self.whisper_config
+        duration = job.get("duration") or 0
+        if not cfg["batch_clip_seconds"] or not 0 < duration <= cfg["batch_clip_seconds"]:
+            return None
+        if job.get("stream") or not job.get("audio_path"):
+            return None
+        backend = self._select_backend(job["model"])
+        if self._use_cascade(job, backend):
+            return None
+        if not BACKENDS[backend].supports_batch:
+            return None
+        return backend, job["model"], job["language"]
 
+    def _stage_transcribe_batch(self, jobs: list) -> list:
+        """批量转录一批短音频，返回每个 job 的下一阶段或异常"""
+        outcomes: list = [None] * len(jobs)
+        active = []
+        for i, job in enumerate(jobs):
+            try:
+                info = self._update_active(
+                    job["task_id"],
+                    status=TaskStatus.TRANSCRIBING.value,
+                    message=f"正在语音识别（Whisper，{len(jobs)} 个短音频批量）...",
+                    progress=30,
+                )
+                active.append((i, job, info))
             except Exception as e:
-                info["status"] = TaskStatus.FAILED.value
-                info["message"] = f"失败: {str(e)}"
-                info["error"] = str(e)
-                info_path.write_text(json.dumps(info, indent=2, ensure_ascii=False))
-
-        # 后台线程执行
-        thread = threading.Thread(target=run, daemon=True)
-        thread.start()
-        return task_id
+                outcomes[i] = e
+
+        if active:
+            backend = self._select_backend(active[0][1]["model"])
+            with self._whisper_slots.hold():
+                results = self._get_backend(backend).transcribe_batch(
+                    [job["audio_path"] for _, job, _ in active],
+                    model=active[0][1]["model"], language=active[0][1]["language"],
+                )
+            for (i, job, info), result in zip(active, results):
+                try:
+                    duration = job.get("preprocess", {}).get("seconds_out") \
+                        or job.get("duration") or probe_duration(job["audio_path"])
+                    # 写入 partial.txt 并更新进度，与逐个转录时的状态字段一致
+                    self._make_segment_sink(job["task_id"], duration)(result["segments"])
+                    result["batch_size"] = len(active)
+                    outcomes[i] = self._finish_transcribe(job, info, result, duration, backend)
+                except Exception as e:
+                    outcomes[i] = e
+        return outcomes
+
+    def _transcribe_file(
+        self, job, model: str, backend: str, duration: float, on_segments, record: bool = False
+    ) -> Dict[str, Any]:
+        """转录已下载的音频：长音频切块并行，否则整段交给后端"""
+        task_id = job["task_id"]
+        cancel = self._cancel_event(task_id)
+        chunk_min = self.whisper_config["chunk_min_duration"]
+        if chunk_min and duration >= chunk_min:
+            # 长音频：静音处切块，进程池并行转录后拼接；各块分别占用转录名额
+            self._update_active(task_id, message="正在语音识别（Whisper，长音频切块并行）...")
+            return self._get_chunker().transcribe(
+                job["audio_path"], model=model, language=job["language"],
+                chunk_seconds=self.whisper_config["chunk_seconds"], backend=backend,
+                duration=duration, on_segments=on_segments, cancel=cancel,
+                slots=self._whisper_slots
+            )
+
+        with self._whisper_slots.hold(cancel):
+            started = time.time()
+            result = self._get_backend(backend).transcribe(
+                job["audio_path"], model=model, language=job["language"],
+                on_segments=on_segments, cancel=cancel
+            )
+        if record:
+            # 记录当前 并发数 × 线程数 组合的实测速度（切块转录的并行方式不同，不计入）
+            self.thread_planner.record(
+                self._cpu_budget, self._transcribe_workers, self._whisper_threads,
+                duration, time.time() - started
+            )
+        return result
+
+    def _use_cascade(self, job, backend: str) -> bool:
+        """
+        是否级联转录：请求的模型比初稿模型大，且后端常驻模型
+        （cli 后端每个重新解码的片段都要启动一次 whisper 并重新加载大模型，比整段转录更慢）
+        """
+        return bool(self.whisper_config["cascade"] and backend != "cli" and draft_model_for(job["model"]))
+
+    def _transcribe_cascade(self, job, backend: str, duration: float, on_segments) -> Dict[str, Any]:
+        """
+        级联转录：小模型出初稿（分段实时写入 partial.txt），
+        低置信度区间切出后用请求的模型重新解码并替换
+        """
+        task_id = job["task_id"]
+        cancel = self._cancel_event(task_id)
+        draft_model = draft_model_for(job["model"])
+
+        self._update_active(task_id, message=f"正在语音识别（{draft_model} 初稿）...")
+        started = time.time()
+        draft = self._transcribe_file(
+            job, draft_model, self._select_backend(draft_model), duration, on_segments
+        )
+        draft_seconds = time.time() - started
+
+        self._update_active(task_id, message=f"正在用 {job['model']} 重新识别低置信度片段...")
+        full = self._get_backend(backend)
+        with tempfile.TemporaryDirectory(prefix="cascade_") as tmpdir:
+            def redecode(start: float, end: float) -> list:
+                span_path = os.path.join(tmpdir, f"span_{start:.1f}.wav")
+                extract_chunk(job["audio_path"], start, end, span_path)
+                with self._whisper_slots.hold(cancel):
+                    result = full.transcribe(
+                        span_path, model=job["model"], language=job["language"], cancel=cancel
+                    )
+                return [
+                    {**seg, "start": seg["start"] + start, "end": seg["end"] + start}
+                    for seg in result.get("segments", [])
+                ]
+
+            result = refine(draft, redecode, duration, cancel)
+
+        stats = result["cascade"]
+        full_seconds = self._estimate_transcribe_seconds(backend, job["model"], duration, stats)
+        stats.update({
+            "draft_model": draft_model,
+            "draft_seconds": round(draft_seconds, 1),
+            "full_seconds_estimate": full_seconds,
+            "saved_seconds": round(full_seconds - draft_seconds - stats["redecode_seconds"], 1)
+            if full_seconds is not None else None,
+        })
+        return result
+
+    def _estimate_transcribe_seconds(
+        self, backend: str, model: str, duration: float, cascade: Dict[str, Any]
+    ) -> Optional[float]:
+        """整段用请求的模型转录的预计耗时：优先用基准测试的实时率，否则按重新解码的速度外推"""
+        for entry in self._load_benchmark():
+            if entry.get("backend") == backend and entry.get("model") == model \
+                    and entry.get("realtime_factor"):
+                return round(entry["realtime_factor"] * duration, 1)
+        if cascade["redecoded_seconds"]:
+            return round(cascade["redecode_seconds"] / cascade["redecoded_seconds"] * duration, 1)
+        return None
+
+    def _transcribe_stream(self, job, info, backend: str, on_segments) -> Dict[str, Any]:
+        """yt-dlp → ffmpeg → 有界 PCM 缓冲区 → 转录引擎，下载和转录重叠进行"""
+        profile_args = AUDIO_PROFILES.get(job.get("audio_profile") or "native", [])
+        # 流式只取格式选择，不做 -x 后处理
+        ytdlp_args = ['-f', profile_args[profile_args.index('-f') + 1]] if '-f' in profile_args else None
+        cancel = self._cancel_event(job["task_id"])
+        with self._whisper_slots.hold(cancel), \
+                AudioStream(self._ytdlp_source(info, job), ytdlp_args, cancel=cancel) as stream:
+            return self._get_backend(backend).transcribe_stream(
+                stream, model=job["model"], language=job["language"],
+                on_segments=on_segments, cancel=cancel
+            )
+
+    def _make_segment_sink(self, task_id: str, duration: float):
+        """
+        生成分段回调：分段追加写入 partial.txt，并更新进度和预计剩余时间
+
+        progress 在转录阶段按已解码音频时长从 30 线性增长到 90
+        """
+        partial_path = self._get_task_path(task_id) / "partial.txt"
+        partial_path.write_text("", encoding="utf-8")
+        state = {"segments": 0, "audio_seconds": 0.0, "started": time.time()}
+
+        def on_segments(segments):
+            with open(partial_path, "a", encoding="utf-8") as f:
+                for seg in segments:
+                    f.write(seg["text"].strip() + "\n")
+
+            state["segments"] += len(segments)
+            state["audio_seconds"] = max(
+                [state["audio_seconds"]] + [seg.get("end", 0) for seg in segments]
+            )
+            done = state["audio_seconds"]
+            fields = {"segments_done": state["segments"], "audio_seconds_done": round(done, 1)}
+            if duration and done > 0:
+                elapsed = time.time() - state["started"]
+                fields["progress"] = 30 + int(60 * min(1.0, done / duration))
+                fields["eta_seconds"] = round(max(0.0, elapsed / done * (duration - done)), 1)
+            self._update_active(task_id, **fields)
+
+        return on_segments
+
+    # === 阶段3: 格式化输出 ===
+    def _stage_format(self, job: Dict[str, Any]) -> Optional[str]:
+        task_id = job["task_id"]
+        info = self._update_active(
+            task_id,
+            status=TaskStatus.FORMATTING.value,
+            message="正在生成文档...",
+            progress=90,
+        )
+
+        # 生成输出文件
+        output_path = self._generate_output(
+            self._get_task_path(task_id), task_id, info["url"],
+            info.get("video_info", {}), Path(job["txt_path"]), job["output_format"]
+        )
+
+        # 写入转录缓存，同一视频再次提交时直接复用
+        # （先于标记完成：等待者被唤醒后立即重新提交也能命中缓存）
+        txt_path = Path(job["txt_path"])
+        if info.get("use_cache", True) and info.get("video_id") and txt_path.exists():
+            self.cache.put(
+                info["video_id"],
+                SUBTITLE_MODEL if job.get("subtitle_hit")
+                else job.get("duplicate_of", {}).get("model") or job["model"],
+                job["language"],
+                txt_path.read_text(encoding="utf-8"),
+                info.get("video_info", {}),
+                str(output_path),
+            )
+
+        # === 完成 ===
+        # 本阶段耗时随完成状态一起写入，等待者被唤醒时 timings 已完整
+        self._update_active(
+            task_id,
+            **(self._stage_timing("format", task_id) or {}),
+            status=TaskStatus.COMPLETED.value,
+            message="转录完成" + (
+                "（字幕）" if job.get("subtitle_hit")
+                else "（复用相同音频的转录）" if job.get("duplicate_of") else "（Whisper）"
+            ),
+            progress=100,
+            eta_seconds=0,
+            output_path=str(output_path),
+        )
+
+        return None
 
     def _generate_output(
         self,
@@ -383,7 +1484,8 @@ class AsyncTranscriber:
 
         if format == "markdown":
             output_path = date_folder / f"{filename}.md"
-            self._generate_markdown(output_path, task_id, url, video_info, transcript)
+            # Markdown 会按发布日期等信息重命名，以实际写入的路径为准
+            output_path = self._generate_markdown(output_path, task_id, url, video_info, transcript)
         elif format == "txt":
             output_path = date_folder / f"{filename}.txt"
             output_path.write_text(transcript)
@@ -496,46 +1598,208 @@ class AsyncTranscriber:
 
     def get_status(self, task_id: str) -> Optional[Dict]:
         """获取任务状态"""
-        task_path = self._get_task_path(task_id)
-        info_path = task_path / "info.json"
-
-        if not info_path.exists():
-            return None
-
-        # 重试几次，防止后台线程写入时读到不完整的 JSON
-        for _ in range(3):
-            try:
-                return json.loads(info_path.read_text())
-            except (json.JSONDecodeError, OSError):
-                time.sleep(0.5)
+        return self.store.get(task_id)
 
-        return {"task_id": task_id, "status": "unknown", "message": "状态文件读取失败，可能正在写入"}
-
-    def get_transcript(self, task_id: str) -> Optional[str]:
-        """获取转录结果"""
+    def get_transcript(self, task_id: str, preview: bool = False) -> Optional[str]:
+        """获取转录结果（preview=True 时获取小模型预览）"""
         status = self.get_status(task_id)
+        if preview:
+            preview_path = (status or {}).get("preview_path")
+            if preview_path and Path(preview_path).exists():
+                return Path(preview_path).read_text()
+            return None
         if status and status["status"] == TaskStatus.COMPLETED.value:
             output_path = status.get("output_path")
             if output_path and Path(output_path).exists():
                 return Path(output_path).read_text()
         return None
 
-    def list_tasks(self) -> list:
-        """列出所有任务"""
-        tasks = []
-        for task_path in self.task_dir.iterdir():
-            if task_path.is_dir():
-                status = self.get_status(task_path.name)
-                if status:
-                    tasks.append({
-                        "task_id": status["task_id"],
-                        "url": status["url"],
-                        "status": status["status"],
-                        "message": status["message"],
-                        "created_at": status["created_at"],
-                        "output_path": status.get("output_path")
-                    })
-        return sorted(tasks, key=lambda x: x["created_at"], reverse=True)
+    def get_partial_transcript(self, task_id: str, since_offset: int = 0) -> Optional[Dict]:
+        """
+        获取增量转录文本
+
+        返回 since_offset（字节偏移）之后新增的完整行和新的偏移量，
+        调用方下次用返回的 offset 继续读取即可只拿到新文本
+        """
+        status = self.get_status(task_id)
+        if not status:
+            return None
+
+        partial_path = self._get_task_path(task_id) / "partial.txt"
+        data = b""
+        if partial_path.exists():
+            with open(partial_path, "rb") as f:
+                f.seek(since_offset)
+                data = f.read()
+        # 只返回到最后一个换行，避免读到正在写入的半行
+        data = data[:data.rfind(b"\n") + 1]
+
+        return {
+            "task_id": task_id,
+            "text": data.decode("utf-8", errors="ignore"),
+            "offset": since_offset + len(data),
+            "segments_done": status.get("segments_done", 0),
+            "done": status["status"] in FINISHED_STATUSES,
+        }
+
+    def wait_task(self, task_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        阻塞等待任务结束，返回任务信息；超时返回当前状态，任务不存在返回 None
+
+        由本进程内的状态变化直接唤醒，不轮询任务库
+        """
+        self.wait_any([task_id], timeout)
+        return self.get_status(task_id)
+
+    def wait_any(self, task_ids: list, timeout: Optional[float] = None) -> Optional[str]:
+        """阻塞等待任一任务结束，返回最先结束的任务ID；超时或任务都不存在返回 None"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._status_changed:
+            while True:
+                existing = False
+                for task_id in task_ids:
+                    info = self.store.get(task_id)
+                    if info is None:
+                        continue
+                    existing = True
+                    if info["status"] in FINISHED_STATUSES:
+                        return task_id
+                if not existing:
+                    return None
+
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._status_changed.wait(remaining)
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """等待已提交的任务全部完成（超时返回 False），然后释放切块进程池"""
+        drained = True
+        if self._pipeline is not None:
+            drained = self._pipeline.join(timeout)
+        if self._chunker is not None:
+            self._chunker.shutdown()
+            self._chunker = None
+        return drained
+
+    def audio_profile_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按音频获取方式汇总下载 / 解码耗时和下载体积"""
+        grouped: Dict[str, list] = {}
+        for info in self.store.list():
+            acquisition = info.get("acquisition")
+            if acquisition:
+                grouped.setdefault(acquisition["profile"], []).append(acquisition)
+
+        def avg(items, key):
+            values = [item[key] for item in items if item.get(key) is not None]
+            return round(sum(values) / len(values), 3) if values else None
+
+        return {
+            profile: {
+                "tasks": len(items),
+                "avg_download_seconds": avg(items, "download_seconds"),
+                "avg_decode_seconds": avg(items, "decode_seconds"),
+                "avg_bytes": avg(items, "bytes"),
+            }
+            for profile, items in grouped.items()
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        汇总已完成任务的耗时分布
+
+        各阶段耗时的 p50 / p95（整体、按平台、按模型），字幕命中率，
+        Whisper 转录的实时率（转录耗时 / 音频时长，越小越快），
+        以及各音频获取方式和各字幕来源的统计。
+        """
+        tasks = [info for info in self.store.list(status=TaskStatus.COMPLETED.value) if info.get("timings")]
+
+        def percentiles(values) -> Dict[str, Any]:
+            values = sorted(values)
+            if not values:
+                return {"count": 0, "p50": None, "p95": None}
+            pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+            return {"count": len(values), "p50": round(pick(0.5), 3), "p95": round(pick(0.95), 3)}
+
+        def by_stage(items) -> Dict[str, Dict[str, Any]]:
+            grouped: Dict[str, list] = {}
+            for info in items:
+                for stage, timing in info["timings"].items():
+                    if timing.get("ok"):
+                        grouped.setdefault(stage, []).append(timing["seconds"])
+                grouped.setdefault("total", []).append(
+                    sum(timing["seconds"] for timing in info["timings"].values())
+                )
+            return {stage: percentiles(values) for stage, values in grouped.items()}
+
+        def group_by(key) -> Dict[str, Dict[str, Any]]:
+            grouped: Dict[str, list] = {}
+            for info in tasks:
+                grouped.setdefault(key(info) or "unknown", []).append(info)
+            return {name: by_stage(items) for name, items in grouped.items()}
+
+        whisper_tasks = [info for info in tasks if not info.get("subtitle_source")]
+        realtime_factors = [
+            info["timings"]["transcribe"]["seconds"] / info["audio_seconds"]
+            for info in whisper_tasks
+            if info.get("audio_seconds") and "transcribe" in info["timings"]
+        ]
+        cascade_tasks = [info for info in whisper_tasks if info.get("cascade")]
+        preprocessed = [info for info in whisper_tasks if info.get("preprocess")]
+        return {
+            "tasks": len(tasks),
+            "stages": by_stage(tasks),
+            "by_platform": group_by(lambda info: info.get("platform_name")),
+            # 字幕命中的任务不经过 Whisper，单独归为 subtitle
+            "by_model": group_by(lambda info: "subtitle" if info.get("subtitle_source") else info.get("model")),
+            "by_backend": group_by(lambda info: info.get("backend")),
+            "subtitle_hit_rate": round(1 - len(whisper_tasks) / len(tasks), 3) if tasks else None,
+            "duplicate_hits": sum(1 for info in tasks if info.get("duplicate_of")),
+            "realtime_factor": percentiles(realtime_factors),
+            "cascade": {
+                "redecoded_fraction": percentiles(
+                    info["cascade"]["redecoded_fraction"] for info in cascade_tasks
+                    if info["cascade"].get("redecoded_fraction") is not None
+                ),
+                "saved_seconds": round(sum(
+                    info["cascade"].get("saved_seconds") or 0 for info in cascade_tasks
+                ), 1),
+            },
+            "download_bytes": percentiles(
+                info["acquisition"]["bytes"] for info in tasks
+                if info.get("acquisition", {}).get("bytes")
+            ),
+            "preprocess": {
+                "tasks": len(preprocessed),
+                "seconds_in": round(sum(info["preprocess"]["seconds_in"] for info in preprocessed), 1),
+                "seconds_out": round(sum(info["preprocess"]["seconds_out"] for info in preprocessed), 1),
+            },
+            "audio_profiles": self.audio_profile_stats(),
+            "subtitle_sources": self.subtitle_resolver.stats(),
+            "thread_plans": {
+                "current": f"{self._cpu_budget}:{self._transcribe_workers}x{self._whisper_threads}",
+                "measured": self.thread_planner.stats(),
+            },
+        }
+
+    def list_tasks(
+        self,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> list:
+        """按创建时间倒序列出任务，支持按状态过滤和分页"""
+        return [
+            {
+                "task_id": info["task_id"],
+                "url": info["url"],
+                "status": info["status"],
+                "message": info["message"],
+                "created_at": info["created_at"],
+                "output_path": info.get("output_path")
+            }
+            for info in self.store.list(status=status, limit=limit, offset=offset)
+        ]
 
 
 # 全局实例
@@ -547,14 +1811,49 @@ def submit_task(
     platform: str = "auto",
     model: str = "small",
     language: str = "zh",
-    output_format: str = "markdown"
+    output_format: str = "markdown",
+    use_cache: bool = True,
+    audio_profile: Optional[str] = None,
+    priority: int = 0,
+    preview: bool = False
 ) -> str:
-    """提交转录任务"""
-    task_id = transcriber.create_task(url, platform)
-    transcriber.start_task(task_id, model, language, output_format)
+    """
+    提交转录任务
+
+    use_cache=False 时忽略转录缓存，强制重新处理；
+    audio_profile 指定音频获取方式（见 AUDIO_PROFILES），默认取配置；
+    priority 越小越优先；preview=True 时先生成小模型预览（见 check_task 的 preview_path）
+    """
+    task_id = transcriber.create_task(url, platform, model, language, output_format, use_cache)
+    transcriber.start_task(task_id, model, language, output_format, audio_profile, priority, preview)
     return task_id
 
 
+def submit_many(urls: list, priority: int = 0, **kwargs) -> list:
+    """
+    批量提交转录任务，返回任务ID列表（参数同 submit_task，所有任务共用同一优先级）
+
+    播放列表 / 频道链接会展开为其中的每个视频
+    """
+    task_ids = []
+    for url in urls:
+        if is_playlist_url(url):
+            task_ids += submit_playlist(url, priority=priority, **kwargs)["submitted"]
+        else:
+            task_ids.append(submit_task(url, priority=priority, **kwargs))
+    return task_ids
+
+
+def submit_playlist(url: str, incremental: bool = False, **kwargs) -> Dict:
+    """
+    展开播放列表 / 频道并提交所有条目（其余参数同 submit_task）
+
+    incremental=True 只提交还没同步过的条目；
+    返回 {"source", "entries", "submitted": [任务ID], "skipped"}
+    """
+    return transcriber.submit_playlist(url, incremental, **kwargs)
+
+
 def check_task(task_id: str) -> Dict:
     """检查任务状态"""
     status = transcriber.get_status(task_id)
@@ -566,37 +1865,202 @@ def check_task(task_id: str) -> Dict:
         "status": status["status"],
         "message": status["message"],
         "progress": status.get("progress", 0),
+        "segments_done": status.get("segments_done", 0),
+        "audio_seconds_done": status.get("audio_seconds_done", 0),
+        "eta_seconds": status.get("eta_seconds"),
+        "preview_path": status.get("preview_path"),
         "output_path": status.get("output_path"),
         "error": status.get("error")
     }
 
 
-if __name__ == "__main__":
-    import sys
+def cancel_task(task_id: str) -> Dict:
+    """取消任务，返回 {"task_id", "cancelled"}（任务已结束时 cancelled 为 False）"""
+    return {"task_id": task_id, "cancelled": transcriber.cancel_task(task_id)}
+
+
+def wait_task(task_id: str, timeout: Optional[float] = None) -> Dict:
+    """等待任务结束（或超时）后返回任务状态"""
+    transcriber.wait_task(task_id, timeout)
+    return check_task(task_id)
+
+
+def wait_any(task_ids: list, timeout: Optional[float] = None) -> Dict:
+    """等待任一任务结束，返回它的状态；超时返回 {"task_id": None}"""
+    task_id = transcriber.wait_any(task_ids, timeout)
+    if task_id is None:
+        return {"task_id": None, "message": "等待超时"}
+    return check_task(task_id)
+
+
+def get_partial_transcript(task_id: str, since_offset: int = 0) -> Dict:
+    """获取增量转录文本（从 since_offset 开始的新内容）"""
+    partial = transcriber.get_partial_transcript(task_id, since_offset)
+    if partial is None:
+        return {"error": "任务不存在"}
+    return partial
+
+
+def _daemon_call(cmd: str, local, autostart: bool = False, socket_timeout=30, **args):
+    """
+    CLI 命令优先交给后台服务处理
+
+    服务未运行时：只读命令直接查本地任务库；提交命令自动启动服务。
+    """
+    from transcribe_daemon import DaemonClient, DaemonUnavailable
+    client = DaemonClient()
+    if autostart:
+        client.ensure_running()
+    try:
+        return client.call(cmd, socket_timeout=socket_timeout, **args)
+    except DaemonUnavailable:
+        return local(**args)
 
+
+def _wait_cli(task_id: str) -> Dict:
+    """--wait：由后台服务在任务结束时返回（服务未运行时任务不会再有进展，直接返回当前状态）"""
+    return _daemon_call(
+        "wait", lambda **args: check_task(args["task_id"]),
+        socket_timeout=None, task_id=task_id
+    )
+
+
+def _submit_local(**args) -> list:
+    """服务无法启动时在当前进程内处理，并等待任务完成后再退出"""
+    task_ids = submit_many(**args)
+    print(f"⚠️ 后台服务不可用，在当前进程内处理 {len(task_ids)} 个任务")
+    transcriber.drain()
+    return task_ids
+
+
+def _sync_local(**args) -> Dict:
+    """服务无法启动时在当前进程内同步，并等待任务完成后再退出"""
+    result = submit_playlist(**args)
+    transcriber.drain()
+    return result
+
+
+def _resume_local(**args) -> list:
+    """服务无法启动时在当前进程内恢复，并等待任务完成后再退出"""
+    resumed = transcriber.resume_tasks(**args)
+    transcriber.drain()
+    return resumed
+
+
+if __name__ == "__main__":
     if len(sys.argv) < 2:
         print("用法:")
-        print("  python async_transcriber.py <video_url>           # 提交任务")
-        print("  python async_transcriber.py --status <task_id>    # 检查状态")
-        print("  python async_transcriber.py --list               # 列出任务")
+        print("  python async_transcriber.py <video_url> [<video_url> ...] [--priority N] [--no-cache] [--preview] [--wait]")
+        print("                                                    # 提交任务（自动启动后台服务，N 越小越优先）")
+        print("  python async_transcriber.py --status <task_id> [--wait]  # 检查状态（--wait 等待任务结束）")
+        print("  python async_transcriber.py --list [status] [page]  # 列出任务（每页 50 条）")
         print("  python async_transcriber.py --cat <task_id>     # 查看结果")
+        print("  python async_transcriber.py --cat <task_id> --preview  # 查看小模型预览")
+        print("  python async_transcriber.py --partial <task_id> [offset]  # 查看已转录部分")
+        print("  python async_transcriber.py --stats           # 各阶段耗时 p50/p95、字幕命中率、实时率")
+        print("  python async_transcriber.py --benchmark-backends <sample_audio> <reference.txt> [model ...]")
+        print("                                                    # 测试各转录后端 × 模型的实时率、峰值内存和词错误率")
+        print("  python async_transcriber.py --shutdown          # 处理完已提交任务后关闭后台服务")
+        print("  python async_transcriber.py --resume [task_id]  # 从检查点恢复中断的任务")
+        print("  python async_transcriber.py --cancel <task_id>  # 取消任务，终止下载 / 转录并删除音频")
+        print("  python async_transcriber.py --sync <playlist_url> [--priority N]  # 只提交频道 / 播放列表的新视频")
         sys.exit(1)
 
     if sys.argv[1] == "--status" and len(sys.argv) > 2:
-        result = check_task(sys.argv[2])
+        if "--wait" in sys.argv[3:]:
+            result = _wait_cli(sys.argv[2])
+        else:
+            result = _daemon_call("status", check_task, task_id=sys.argv[2])
         print(json.dumps(result, indent=2, ensure_ascii=False))
     elif sys.argv[1] == "--list":
-        for task in transcriber.list_tasks():
-            status_icon = "✅" if task["status"] == "completed" else "🔄" if task["status"] != "failed" else "❌"
+        status_filter, page = None, 1
+        for arg in sys.argv[2:]:
+            if arg.isdigit():
+                page = max(1, int(arg))
+            else:
+                status_filter = arg
+        tasks = _daemon_call(
+            "list", transcriber.list_tasks,
+            status=status_filter, limit=50, offset=(page - 1) * 50
+        )
+        for task in tasks:
+            status_icon = {"completed": "✅", "failed": "❌", "cancelled": "⏹"}.get(task["status"], "🔄")
             print(f"{status_icon} {task['task_id']} | {task['status']} | {task['message']}")
+    elif sys.argv[1] == "--partial" and len(sys.argv) > 2:
+        offset = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+        result = _daemon_call(
+            "partial", get_partial_transcript, task_id=sys.argv[2], since_offset=offset
+        )
+        print(json.dumps(result, indent=2, ensure_ascii=False))
     elif sys.argv[1] == "--cat" and len(sys.argv) > 2:
-        transcript = transcriber.get_transcript(sys.argv[2])
+        transcript = _daemon_call(
+            "cat", transcriber.get_transcript, task_id=sys.argv[2], preview="--preview" in sys.argv
+        )
         if transcript:
             print(transcript)
         else:
             print("结果未完成或不存在")
+    elif sys.argv[1] == "--resume":
+        resumed = _daemon_call(
+            "resume", _resume_local, autostart=True, task_ids=sys.argv[2:] or None
+        )
+        print(f"✅ 已恢复 {len(resumed)} 个任务")
+        for task_id in resumed:
+            print(f"   {task_id}")
+    elif sys.argv[1] == "--sync" and len(sys.argv) > 2:
+        priority = int(sys.argv[sys.argv.index("--priority") + 1]) if "--priority" in sys.argv else 0
+        # 服务端在请求内展开播放列表（最长数分钟），不能用默认的 socket 超时
+        result = _daemon_call(
+            "sync", _sync_local, autostart=True, socket_timeout=None,
+            url=sys.argv[2], incremental=True, priority=priority
+        )
+        print(f"✅ {result['source']}: {result['entries']} 个新条目，"
+              f"提交 {len(result['submitted'])} 个，跳过 {result['skipped']} 个（已转录或重复）")
+        for task_id in result["submitted"]:
+            print(f"   {task_id}")
+    elif sys.argv[1] == "--stats":
+        print(json.dumps(_daemon_call("stats", transcriber.stats), indent=2, ensure_ascii=False))
+    elif sys.argv[1] == "--benchmark-backends" and len(sys.argv) > 3:
+        models = sys.argv[4:] or ["tiny", "base", "small"]
+        results = benchmark_backends(
+            sys.argv[2], Path(sys.argv[3]).read_text(encoding="utf-8"), models,
+            threads=transcriber._whisper_threads
+        )
+        for entry in results:
+            if entry.get("error"):
+                print(f"❌ {entry['backend']:<12} {entry['model']:<8} {entry['error'][:80]}")
+            else:
+                print(f"✅ {entry['backend']:<12} {entry['model']:<8} 实时率 {entry['realtime_factor']:<7} "
+                      f"峰值内存 {entry['peak_rss_mb']} MB  WER {entry['wer']}")
+        max_wer = transcriber.whisper_config["max_wer"]
+        for model in models:
+            selected = select_backend(model, results, max_wer)
+            print(f"   {model}: 自动选择 {selected or '无满足 WER ≤ ' + str(max_wer) + ' 的后端'}")
+    elif sys.argv[1] == "--cancel" and len(sys.argv) > 2:
+        result = _daemon_call("cancel", cancel_task, task_id=sys.argv[2])
+        print("✅ 任务已取消" if result["cancelled"] else "任务已结束，无需取消")
+    elif sys.argv[1] == "--shutdown":
+        result = _daemon_call("shutdown", lambda: {"draining": False, "message": "后台服务未运行"})
+        print(json.dumps(result, indent=2, ensure_ascii=False))
     else:
-        task_id = submit_task(sys.argv[1])
-        print(f"✅ 任务已提交: {task_id}")
+        args = sys.argv[1:]
+        priority = 0
+        if "--priority" in args:
+            i = args.index("--priority")
+            priority = int(args[i + 1])
+            del args[i:i + 2]
+        urls = [arg for arg in args if not arg.startswith("--")]
+
+        # 含播放列表时服务端要先展开，同样不设 socket 超时
+        task_ids = _daemon_call(
+            "submit_many", _submit_local, autostart=True, socket_timeout=None,
+            urls=urls, priority=priority, use_cache="--no-cache" not in args,
+            preview="--preview" in args
+        )
+        for task_id in task_ids:
+            print(f"✅ 任务已提交: {task_id}")
         print(f"   输出位置: ~/Documents/video-transcribe/")
         print(f"   格式: Markdown")
+        if "--wait" in args:
+            for task_id in task_ids:
+                print(json.dumps(_wait_cli(task_id), indent=2, ensure_ascii=False))
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+长音频静音切块 + 多进程并行转录
+
+在静音处把长音频切成若干块，用进程池并行转录，
+再按时间偏移拼接结果，并去掉块边界重叠部分的重复文本。
+"""
+
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from thread_planner import CoreSlots
+
+
+# 切块配置
+CHUNK_CONFIG = {
+    "noise_db": -35,         # 低于该音量视为静音（dB）
+    "min_silence": 0.5,      # 最短静音时长（秒）
+    "search_ratio": 0.25,    # 在目标切点前后 chunk_seconds × ratio 范围内找静音
+    "overlap": 1.0,          # 块之间的重叠（秒），防止切点处丢字
+    "sample_rate": 16000,
+    "poll_interval": 0.5,    # 等待块结果时检查取消的间隔（秒）
+}
+
+
+def probe_duration(audio_path: str) -> float:
+    """用 ffprobe 获取音频时长（秒），失败返回 0"""
+    try:
+        result = subprocess.run([
+            'ffprobe', '-v', 'error',
+            '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1',
+            str(audio_path)
+        ], capture_output=True, text=True, timeout=60)
+        return float(result.stdout.strip())
+    except Exception:
+        return 0.0
+
+
+def detect_silences(
+    audio_path: str,
+    noise_db: float = CHUNK_CONFIG["noise_db"],
+    min_silence: float = CHUNK_CONFIG["min_silence"]
+) -> List[Tuple[float, float]]:
+    """用 ffmpeg silencedetect 找出静音区间 [(start, end), ...]"""
+    result = subprocess.run([
+        'ffmpeg', '-hide_banner', '-nostats', '-i', str(audio_path),
+        '-af', f'silencedetect=noise={noise_db}dB:d={min_silence}',
+        '-f', 'null', '-'
+    ], capture_output=True, text=True)
+
+    silences = []
+    start = None
+    for line in result.stderr.splitlines():
+        m = re.search(r'silence_start: (-?[\d.]+)', line)
+        if m:
+            start = max(0.0, float(m.group(1)))
+            continue
+        m = re.search(r'silence_end: ([\d.]+)', line)
+        if m and start is not None:
+            silences.append((start, float(m.group(1))))
+            start = None
+    return silences
+
+
+def plan_chunks(
+    duration: float,
+    silences: List[Tuple[float, float]],
+    chunk_seconds: float,
+    search_ratio: float = CHUNK_CONFIG["search_ratio"]
+) -> List[Tuple[float, float]]:
+    """
+    规划切块区间
+
+    每隔约 chunk_seconds 取一个切点，优先落在附近最长的静音中点；
+    附近没有静音时直接在目标位置切。
+    """
+    if duration <= chunk_seconds:
+        return [(0.0, duration)]
+
+    window = chunk_seconds * search_ratio
+    cuts = []
+    last_cut = 0.0
+    while duration - last_cut > chunk_seconds + window:
+        target = last_cut + chunk_seconds
+        candidates = [
+            (end - start, (start + end) / 2)
+            for start, end in silences
+            if abs((start + end) / 2 - target) <= window
+        ]
+        cut = max(candidates)[1] if candidates else target
+        cuts.append(cut)
+        last_cut = cut
+
+    bounds = [0.0] + cuts + [duration]
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+
+def extract_chunk(audio_path: str, start: float, end: float, dst: str):
+    """切出一段音频，转成 16kHz 单声道 wav"""
+    subprocess.run([
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+        '-ss', f'{start:.3f}', '-t', f'{end - start:.3f}',
+        '-i', str(audio_path),
+        '-ac', '1', '-ar', str(CHUNK_CONFIG["sample_rate"]),
+        dst
+    ], check=True, capture_output=True)
+
+
+class CancelFlag:
+    """
+    跨进程的取消标志：标志文件存在即为已取消
+
+    与 threading.Event 一样提供 is_set()，可直接传给后端的 cancel 参数；
+    只含路径，能随任务发给进程池中的 worker
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def set(self):
+        Path(self.path).touch()
+
+    def is_set(self) -> bool:
+        return os.path.exists(self.path)
+
+
+# === 进程池 worker ===
+
+_worker_options: Dict[str, Any] = {}
+_worker_backends: Dict[str, Any] = {}
+
+
+def _init_worker(threads: int, device: Optional[str]):
+    """进程池初始化：记录后端参数，后端在首次使用时创建并在 worker 内常驻"""
+    _worker_options.update(threads=threads, device=device, max_models=1)
+
+
+def _transcribe_chunk(
+    chunk_path: str,
+    offset: float,
+    model: str,
+    language: str,
+    backend: str,
+    cancel: Optional[CancelFlag] = None
+) -> List[Dict[str, Any]]:
+    """转录单个块，返回已加上时间偏移的分段；cancel 被设置后后端尽快中止"""
+    if cancel is not None and cancel.is_set():
+        raise RuntimeError("转录已取消")
+    if backend not in _worker_backends:
+        from transcribe_backends import create_backend
+        _worker_backends[backend] = create_backend(backend, **_worker_options)
+    result = _worker_backends[backend].transcribe(chunk_path, model=model, language=language, cancel=cancel)
+
+    return [
+        {
+            "start": seg["start"] + offset,
+            "end": seg["end"] + offset,
+            "text": seg["text"].strip(),
+            # 置信度供级联转录挑选需要重新解码的分段
+            **{key: seg[key] for key in ("avg_logprob", "no_speech_prob") if key in seg},
+        }
+        for seg in result.get("segments", [])
+        if seg.get("text", "").strip()
+    ]
+
+
+# === 拼接 ===
+
+def _normalize(text: str) -> str:
+    return re.sub(r'[\s\W_]+', '', text.lower())
+
+
+class SegmentStitcher:
+    """
+    按顺序逐块拼接分段，去掉块边界重叠区的重复
+
+    后一块中结束时间不晚于已有结果末尾的分段视为重叠，直接丢弃；
+    跨越边界的分段若文本与前一块末尾重复也丢弃。
+    """
+
+    def __init__(self):
+        self.segments: List[Dict[str, Any]] = []
+
+    def add(self, chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """拼接下一块，返回本次新增的分段"""
+        if not self.segments:
+            self.segments.extend(chunk)
+            return list(chunk)
+
+        last_end = self.segments[-1]["end"]
+        tail = _normalize("".join(seg["text"] for seg in self.segments[-3:]))
+        added = []
+        for seg in chunk:
+            if seg["end"] <= last_end:
+                continue
+            if seg["start"] < last_end:
+                norm = _normalize(seg["text"])
+                if norm and norm in tail:
+                    continue
+            added.append(seg)
+        self.segments.extend(added)
+        return added
+
+
+def stitch_segments(chunks: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """一次性拼接所有块"""
+    stitcher = SegmentStitcher()
+    for chunk in chunks:
+        stitcher.add(chunk)
+    return stitcher.segments
+
+
+class ChunkedTranscriber:
+    """长音频切块并行转录（进程池常驻，worker 内模型跨任务复用）"""
+
+    def __init__(
+        self,
+        workers: int,
+        threads_per_worker: int = 1,
+        device: Optional[str] = None
+    ):
+        self.workers = max(1, workers)
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.device = device
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn：避免在多线程进程里 fork 导致 torch 死锁
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.threads_per_worker, self.device),
+            )
+        return self._pool
+
+    def transcribe(
+        self,
+        audio_path: str,
+        model: str,
+        language: str,
+        chunk_seconds: float,
+        backend: str = "cli",
+        duration: Optional[float] = None,
+        on_segments: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+        cancel: Optional[threading.Event] = None,
+        slots: Optional[CoreSlots] = None
+    ) -> Dict[str, Any]:
+        """
+        切块并行转录
+
+        返回与 whisper 结果同构的 {"text", "segments"}，时间戳相对原音频
+        传入 on_segments 时，每按顺序完成一块就回调该块新增的分段
+        传入 slots 时每一块先取得一个转录名额，块转录结束后归还
+        cancel 被设置后不再提交新块、撤销排队中的块，并通知 worker 中止正在转录的块
+        （cli 后端立即终止 whisper 进程，其余后端在下一个分段处中止），等它们退出后返回
+        """
+        duration = duration or probe_duration(audio_path)
+        silences = detect_silences(audio_path)
+        spans = plan_chunks(duration, silences, chunk_seconds)
+        overlap = CHUNK_CONFIG["overlap"]
+
+        pool = self._get_pool()
+        decode_seconds = 0.0
+        with tempfile.TemporaryDirectory(prefix="chunks_") as tmpdir:
+            futures = []
+            stitcher = SegmentStitcher()
+            flag = CancelFlag(os.path.join(tmpdir, "cancelled"))
+            stitched = 0
+
+            def drain():
+                # 按顺序拼接已完成的块；等待名额期间也要调用，部分结果才能及时写出
+                nonlocal stitched
+                while stitched < len(futures) and futures[stitched].done():
+                    added = stitcher.add(futures[stitched].result())
+                    stitched += 1
+                    if on_segments and added:
+                        on_segments(added)
+
+            try:
+                for i, (start, end) in enumerate(spans):
+                    self._check_cancel(cancel)
+                    start = max(0.0, start - overlap) if i > 0 else start
+                    end = min(duration, end + overlap)
+                    chunk_path = os.path.join(tmpdir, f"chunk_{i:04d}.wav")
+                    started = time.time()
+                    extract_chunk(audio_path, start, end, chunk_path)
+                    decode_seconds += time.time() - started
+                    if slots is not None:
+                        while not slots.try_acquire(CHUNK_CONFIG["poll_interval"]):
+                            self._check_cancel(cancel)
+                            drain()
+                    try:
+                        future = pool.submit(
+                            _transcribe_chunk, chunk_path, start, model, language, backend, flag
+                        )
+                    except BaseException:
+                        if slots is not None:
+                            slots.release()
+                        raise
+                    if slots is not None:
+                        # 撤销的块也会回调
+                        future.add_done_callback(lambda _: slots.release())
+                    futures.append(future)
+                    drain()
+                while stitched < len(futures):
+                    wait([futures[stitched]], timeout=CHUNK_CONFIG["poll_interval"])
+                    self._check_cancel(cancel)
+                    drain()
+            except BaseException:
+                flag.set()
+                for future in futures:
+                    future.cancel()
+                # 等正在转录的块中止，临时目录（含标志文件）要在它们退出后才能删除
+                wait(futures)
+                raise
+
+        segments = stitcher.segments
+        return {
+            "text": " ".join(seg["text"] for seg in segments),
+            "segments": segments,
+            "chunks": len(spans),
+            "decode_seconds": round(decode_seconds, 3),
+        }
+
+    @staticmethod
+    def _check_cancel(cancel: Optional[threading.Event]):
+        if cancel is not None and cancel.is_set():
+            raise RuntimeError("转录已取消")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
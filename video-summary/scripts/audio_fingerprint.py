@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+音频指纹去重
+
+同一个演讲常在 YouTube 发布后又被搬运到 B站，URL 缓存识别不出来。
+这里对下载音频的开头几分钟计算紧凑的声学指纹（每 50ms 一个 32 位子指纹，
+由相邻频带能量差的变化符号构成，对重新编码、音量变化不敏感），存入索引；
+新任务的指纹与已有指纹匹配、且总时长相近时直接复用对方的转录结果
+（开头相同的剪辑版、节选版时长不同，不能复用）。
+
+查找时先用子指纹倒排表投票，得到候选及其时间偏移（容忍开头多几秒、少几秒），
+再按误码率逐位比较确认。
+"""
+
+import importlib.util
+import shutil
+import subprocess
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from sqlite_store import SQLiteStore
+
+
+# 指纹配置
+FINGERPRINT_CONFIG = {
+    "seconds": 180,              # 取音频开头多少秒
+    "sample_rate": 8000,
+    "frame_samples": 2048,       # 每帧 0.256 秒
+    "hop_seconds": 0.05,         # 帧移，帧之间大量重叠，对齐误差影响小
+    "band_low": 300,             # 频带范围（Hz），语音能量集中的区域
+    "band_high": 2000,
+    "index_stride": 4,           # 每隔几帧把子指纹写入倒排表
+    "min_hits": 5,               # 候选在同一偏移上至少命中几个子指纹
+    "max_ber": 0.3,              # 误码率不超过此值视为同一段音频
+    "min_overlap_seconds": 60,   # 比较时至少重叠的时长（短音频按其 80% 计）
+    "max_duration_diff": 0.05,   # 双方时长都已知时，相差超过较长者的该比例不算同一音频
+    "min_duration_slack": 10,    # 时长容差至少为这么多秒（片头片尾多几秒）
+    "max_entries": 20000,        # 索引条目上限，超出时淘汰最早的
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    key         TEXT PRIMARY KEY,
+    fingerprint BLOB NOT NULL,
+    duration    REAL,
+    created_at  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fingerprint_hashes (
+    hash     INTEGER NOT NULL,
+    key      TEXT NOT NULL,
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fingerprint_hashes_hash ON fingerprint_hashes(hash);
+CREATE INDEX IF NOT EXISTS idx_fingerprint_hashes_key ON fingerprint_hashes(key);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_created ON fingerprints(created_at);
+"""
+
+# 静音等无信息的帧，不参与倒排投票
+_DEGENERATE = (0, 0xFFFFFFFF)
+
+
+def fingerprint_available() -> bool:
+    """计算指纹需要 numpy 和 ffmpeg"""
+    return importlib.util.find_spec("numpy") is not None and shutil.which("ffmpeg") is not None
+
+
+def fingerprint_audio(audio_path: str, seconds: float = FINGERPRINT_CONFIG["seconds"]):
+    """
+    计算音频开头 seconds 秒的指纹，返回 uint32 numpy 数组（每帧一个子指纹）
+
+    频带按对数划分为 33 个，子指纹第 m 位为
+    (E[n, m] - E[n, m+1]) - (E[n-1, m] - E[n-1, m+1]) > 0
+    """
+    import numpy as np
+    cfg = FINGERPRINT_CONFIG
+    rate, frame = cfg["sample_rate"], cfg["frame_samples"]
+    result = subprocess.run([
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-t', str(seconds), '-i', str(audio_path),
+        '-ac', '1', '-ar', str(rate), '-f', 's16le', 'pipe:1'
+    ], capture_output=True, check=True)
+    samples = np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32)
+
+    hop = int(cfg["hop_seconds"] * rate)
+    if len(samples) < frame + hop:
+        return np.zeros(0, dtype=np.uint32)
+    starts = np.arange(0, len(samples) - frame + 1, hop)
+    frames = samples[starts[:, None] + np.arange(frame)] * np.hanning(frame).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+
+    edges = np.geomspace(cfg["band_low"], cfg["band_high"], 34)
+    bins = np.round(edges * frame / rate).astype(int)
+    # reduceat 的第 i 段为 bins[i]:bins[i+1]，最后一段（到频谱末尾）丢弃
+    energy = np.add.reduceat(power, bins, axis=1)[:, :33]
+
+    diff = energy[:, :-1] - energy[:, 1:]
+    bits = (diff[1:] - diff[:-1]) > 0
+    return np.packbits(bits, axis=1, bitorder="little").view("<u4").ravel()
+
+
+def bit_error_rate(query, stored, shift: int, min_overlap: int) -> Optional[float]:
+    """query[i] 与 stored[i - shift] 逐位比较的误码率；重叠不足 min_overlap 帧返回 None"""
+    import numpy as np
+    a = query[max(0, shift):]
+    b = stored[max(0, -shift):]
+    n = min(len(a), len(b))
+    if n < min_overlap or n == 0:
+        return None
+    errors = np.unpackbits(np.bitwise_xor(a[:n], b[:n]).view(np.uint8)).sum()
+    return float(errors) / (32 * n)
+
+
+def durations_close(a: float, b: float) -> bool:
+    """两段音频的总时长是否在容差以内"""
+    cfg = FINGERPRINT_CONFIG
+    slack = max(cfg["max_duration_diff"] * max(a, b), cfg["min_duration_slack"])
+    return abs(a - b) <= slack
+
+
+class FingerprintIndex(SQLiteStore):
+    """音频指纹索引（SQLite）：key 为规范化视频 ID"""
+
+    schema = SCHEMA
+
+    def __init__(self, db_path: str, max_entries: int = FINGERPRINT_CONFIG["max_entries"]):
+        super().__init__(db_path)
+        self.max_entries = max_entries
+
+    def add(self, key: str, fingerprint, duration: Optional[float] = None):
+        """写入（或替换）一条指纹，超出上限时淘汰最早的条目"""
+        stride = FINGERPRINT_CONFIG["index_stride"]
+        rows = [
+            (int(value), key, position)
+            for position, value in enumerate(fingerprint.tolist())
+            if position % stride == 0 and value not in _DEGENERATE
+        ]
+
+        def write(conn):
+            conn.execute("DELETE FROM fingerprint_hashes WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (key, fingerprint, duration, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, fingerprint.astype("<u4").tobytes(), duration, datetime.now().isoformat())
+            )
+            conn.executemany(
+                "INSERT INTO fingerprint_hashes (hash, key, position) VALUES (?, ?, ?)", rows
+            )
+
+        self._write(write)
+        self.evict()
+
+    def _load(self, key: str):
+        """返回 (指纹, 时长)，不存在时返回 None"""
+        import numpy as np
+        row = self._conn().execute(
+            "SELECT fingerprint, duration FROM fingerprints WHERE key = ?", (key,)
+        ).fetchone()
+        return (np.frombuffer(row[0], dtype="<u4"), row[1]) if row else None
+
+    def match(
+        self,
+        fingerprint,
+        exclude: Optional[str] = None,
+        duration: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        查找与 fingerprint 相同的音频
+
+        指纹只覆盖开头几分钟，给出 duration 时还要求与已有条目的时长相近
+        （任一方时长未知则不比较）。
+        返回误码率最低的匹配 {"key", "bit_error_rate", "offset_seconds"}
+        （offset_seconds 为正表示新音频比已有音频晚开始），没有返回 None
+        """
+        cfg = FINGERPRINT_CONFIG
+        positions: Dict[int, list] = {}
+        for position, value in enumerate(fingerprint.tolist()):
+            if value not in _DEGENERATE:
+                positions.setdefault(value, []).append(position)
+        if not positions:
+            return None
+
+        # 倒排投票：同一候选在同一偏移上命中的子指纹数
+        votes: Counter = Counter()
+        conn = self._conn()
+        hashes = list(positions)
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            rows = conn.execute(
+                "SELECT hash, key, position FROM fingerprint_hashes "
+                f"WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for value, key, position in rows:
+                if key == exclude:
+                    continue
+                for query_position in positions[value]:
+                    votes[(key, query_position - position)] += 1
+
+        best: Dict[str, tuple] = {}
+        for (key, shift), count in votes.items():
+            if count > best.get(key, (0, 0))[0]:
+                best[key] = (count, shift)
+        candidates = sorted(
+            ((count, key, shift) for key, (count, shift) in best.items() if count >= cfg["min_hits"]),
+            reverse=True
+        )[:5]
+
+        hop = cfg["hop_seconds"]
+        matches = []
+        for _, key, shift in candidates:
+            loaded = self._load(key)
+            if loaded is None:
+                continue
+            stored, stored_duration = loaded
+            if duration and stored_duration and not durations_close(duration, stored_duration):
+                continue
+            min_overlap = min(
+                int(cfg["min_overlap_seconds"] / hop),
+                int(0.8 * min(len(fingerprint), len(stored)))
+            )
+            # 投票的偏移按帧取整，前后各多比较两帧
+            rates = [
+                (rate, s) for s in range(shift - 2, shift + 3)
+                for rate in [bit_error_rate(fingerprint, stored, s, min_overlap)]
+                if rate is not None
+            ]
+            if rates:
+                rate, s = min(rates)
+                if rate <= cfg["max_ber"]:
+                    matches.append({"key": key, "bit_error_rate": round(rate, 3), "offset_seconds": round(s * hop, 2)})
+        return min(matches, key=lambda match: match["bit_error_rate"]) if matches else None
+
+    def evict(self) -> int:
+        """按写入时间淘汰到条目上限以内，返回淘汰条数"""
+        conn = self._conn()
+        (count,) = conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+        keys = [row[0] for row in conn.execute(
+            "SELECT key FROM fingerprints ORDER BY created_at LIMIT ?", (excess,)
+        )]
+        for key in keys:
+            self.remove(key)
+        return len(keys)
+
+    def remove(self, key: str):
+        def write(conn):
+            conn.execute("DELETE FROM fingerprint_hashes WHERE key = ?", (key,))
+            conn.execute("DELETE FROM fingerprints WHERE key = ?", (key,))
+
+        self._write(write)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+转录前的音频预处理
+
+去掉长静音（讲座、播客的停顿、片头片尾空白），可选地把语音整体加速
+（atempo 保持音调），减少送入 Whisper 的音频时长。
+偏移表记录处理后音频的每一段对应原始音频的位置，转录结果的时间戳据此换回原始时间。
+"""
+
+import bisect
+import subprocess
+from typing import Dict, Any, List, Optional, Tuple
+
+from audio_chunker import detect_silences, probe_duration
+
+
+# 预处理配置
+PREPROCESS_CONFIG = {
+    "noise_db": -35,        # 低于该音量视为静音（dB）
+    "min_silence": 2.0,     # 只去掉长于此的静音（秒）
+    "keep_silence": 0.3,    # 每处切口两侧保留的静音（秒），避免切掉词首词尾
+    "speed": 1.0,           # 语音加速倍数（如 1.25~1.5），1.0 表示不加速
+    "min_saving": 0.05,     # 时长减少不足该比例时不处理，直接转录原音频
+    "sample_rate": 16000,
+}
+
+
+class OffsetMap:
+    """
+    处理后音频时间 → 原始音频时间
+
+    pieces 为 [(加速前的输出起点, 原始起点, 时长), ...]，按输出起点排序；
+    输出时间先乘以 speed 还原到加速前，再落到对应的片段上
+    """
+
+    def __init__(self, pieces: List[Tuple[float, float, float]], speed: float = 1.0):
+        self.pieces = pieces
+        self.speed = speed
+        self._starts = [piece[0] for piece in pieces]
+
+    @classmethod
+    def from_spans(cls, spans: List[Tuple[float, float]], speed: float = 1.0) -> "OffsetMap":
+        """由保留的原始区间构造"""
+        pieces = []
+        position = 0.0
+        for start, end in spans:
+            pieces.append((position, start, end - start))
+            position += end - start
+        return cls(pieces, speed)
+
+    def to_original(self, t: float) -> float:
+        if not self.pieces:
+            return t
+        t *= self.speed
+        index = max(0, bisect.bisect_right(self._starts, t) - 1)
+        out_start, orig_start, length = self.pieces[index]
+        return orig_start + min(max(0.0, t - out_start), length)
+
+    def remap(self, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """把分段时间戳换回原始音频时间"""
+        return [
+            {**seg, "start": round(self.to_original(seg["start"]), 3), "end": round(self.to_original(seg["end"]), 3)}
+            for seg in segments
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"speed": self.speed, "pieces": [list(piece) for piece in self.pieces]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OffsetMap":
+        return cls([tuple(piece) for piece in data["pieces"]], data.get("speed", 1.0))
+
+
+def speech_spans(
+    duration: float,
+    silences: List[Tuple[float, float]],
+    keep_silence: float = PREPROCESS_CONFIG["keep_silence"]
+) -> List[Tuple[float, float]]:
+    """去掉静音后保留的原始区间：开头和结尾的静音整段去掉，中间的两侧各留 keep_silence 秒"""
+    spans = []
+    position = 0.0
+    for start, end in sorted(silences):
+        cut_start = start + keep_silence if start > 0 else 0.0
+        cut_end = end - keep_silence if end < duration else duration
+        if cut_end <= cut_start or cut_end <= position:
+            continue
+        if cut_start > position:
+            spans.append((position, cut_start))
+        position = cut_end
+    if position < duration:
+        spans.append((position, duration))
+    return spans
+
+
+def _atempo_chain(speed: float) -> List[str]:
+    # 旧版 ffmpeg 的 atempo 单级只支持 0.5~2.0，超出时串联
+    filters = []
+    while speed > 2.0:
+        filters.append("atempo=2.0")
+        speed /= 2.0
+    filters.append(f"atempo={speed:.4f}")
+    return filters
+
+
+def preprocess_audio(
+    audio_path: str,
+    dst: str,
+    duration: Optional[float] = None,
+    noise_db: float = PREPROCESS_CONFIG["noise_db"],
+    min_silence: float = PREPROCESS_CONFIG["min_silence"],
+    keep_silence: float = PREPROCESS_CONFIG["keep_silence"],
+    speed: float = PREPROCESS_CONFIG["speed"],
+    min_saving: float = PREPROCESS_CONFIG["min_saving"]
+) -> Optional[Dict[str, Any]]:
+    """
+    去静音 / 加速，输出 16kHz 单声道 wav 到 dst
+
+    返回 {"offset_map", "seconds_in", "seconds_out", "silence_removed", "speed"}；
+    时长减少不足 min_saving 时不生成文件，返回 None
+    """
+    duration = duration or probe_duration(audio_path)
+    if not duration:
+        return None
+    spans = speech_spans(duration, detect_silences(audio_path, noise_db, min_silence), keep_silence)
+    kept = sum(end - start for start, end in spans)
+    seconds_out = kept / speed
+    if seconds_out > duration * (1 - min_saving):
+        return None
+
+    # 先切成 10ms 的小帧，aselect 按帧取舍时切口误差不超过一帧
+    rate = PREPROCESS_CONFIG["sample_rate"]
+    filters = [f"aresample={rate}", f"asetnsamples=n={rate // 100}:p=0"]
+    if kept < duration:
+        selected = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in spans)
+        filters += [f"aselect='{selected}'", "asetpts=N/SR/TB"]
+    if speed != 1.0:
+        filters += _atempo_chain(speed)
+
+    subprocess.run([
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+        '-i', str(audio_path),
+        '-af', ",".join(filters),
+        '-ac', '1', '-ar', str(rate),
+        str(dst)
+    ], check=True, capture_output=True)
+
+    return {
+        "offset_map": OffsetMap.from_spans(spans, speed).to_dict(),
+        "seconds_in": round(duration, 1),
+        "seconds_out": round(probe_duration(dst) or seconds_out, 1),
+        "silence_removed": round(duration - kept, 1),
+        "speed": speed,
+    }
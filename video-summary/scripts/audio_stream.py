@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+边下载边解码的音频流
+
+yt-dlp 把音频写到 stdout，经 ffmpeg 解码为 16kHz 单声道 PCM，
+按固定大小的块放进有界缓冲区供转录引擎按窗口消费。
+整段音频不落盘；缓冲区满时下载随管道反压暂停，内存占用有上限。
+"""
+
+import queue
+import subprocess
+import tempfile
+import threading
+from typing import Iterator, List, Optional
+
+from process_control import popen_group, kill_group
+
+
+# 流式配置
+STREAM_CONFIG = {
+    "sample_rate": 16000,
+    "chunk_seconds": 10,     # 每次从 ffmpeg 读取的音频时长（秒）
+    "buffer_seconds": 300,   # 缓冲区最多保留的音频时长（秒），超过时暂停下载
+}
+
+_BYTES_PER_SAMPLE = 2  # s16le
+
+
+class AudioStream:
+    """
+    yt-dlp → ffmpeg → PCM 块
+
+        with AudioStream(['--load-info-json', path]) as stream:
+            for chunk in stream:   # float32 numpy 数组
+                ...
+    """
+
+    def __init__(
+        self,
+        source: List[str],
+        ytdlp_args: Optional[List[str]] = None,
+        chunk_seconds: float = STREAM_CONFIG["chunk_seconds"],
+        buffer_seconds: float = STREAM_CONFIG["buffer_seconds"],
+        cancel: Optional[threading.Event] = None
+    ):
+        """source: yt-dlp 的输入参数（URL 或 --load-info-json <path>）"""
+        self.source = source
+        self.ytdlp_args = ytdlp_args or ['-f', 'bestaudio/best']
+        self.sample_rate = STREAM_CONFIG["sample_rate"]
+        self.chunk_bytes = int(chunk_seconds * self.sample_rate) * _BYTES_PER_SAMPLE
+        self.cancel = cancel
+        self.bytes_read = 0
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, int(buffer_seconds / chunk_seconds)))
+        self._closed = threading.Event()
+        self._procs: List[subprocess.Popen] = []
+        self._stderr = []
+        self._reader: Optional[threading.Thread] = None
+
+    @property
+    def seconds_read(self) -> float:
+        return self.bytes_read / _BYTES_PER_SAMPLE / self.sample_rate
+
+    def start(self):
+        ytdlp_err, ffmpeg_err = tempfile.TemporaryFile(), tempfile.TemporaryFile()
+        self._stderr = [ytdlp_err, ffmpeg_err]
+        ytdlp = popen_group(
+            ['yt-dlp', *self.ytdlp_args, '-o', '-', '--quiet', '--no-warnings', *self.source],
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=ytdlp_err,
+        )
+        ffmpeg = popen_group(
+            ['ffmpeg', '-loglevel', 'error', '-i', 'pipe:0',
+             '-f', 's16le', '-ac', '1', '-ar', str(self.sample_rate), 'pipe:1'],
+            stdin=ytdlp.stdout, stdout=subprocess.PIPE, stderr=ffmpeg_err,
+        )
+        # 只由 ffmpeg 持有管道读端，ffmpeg 退出后 yt-dlp 收到 SIGPIPE
+        ytdlp.stdout.close()
+        self._procs = [ytdlp, ffmpeg]
+        self._reader = threading.Thread(target=self._read, args=(ffmpeg.stdout,), daemon=True)
+        self._reader.start()
+
+    def _read(self, pipe):
+        try:
+            while not self._closed.is_set():
+                data = pipe.read(self.chunk_bytes)
+                if not data:
+                    break
+                # 缓冲区满时阻塞，下载随管道反压暂停
+                while not self._closed.is_set():
+                    try:
+                        self._queue.put(data, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+        finally:
+            self._put_end()
+
+    def _put_end(self):
+        while not self._closed.is_set():
+            try:
+                self._queue.put(None, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def __iter__(self) -> Iterator:
+        import numpy as np
+        remainder = b""
+        while True:
+            if self.cancel is not None and self.cancel.is_set():
+                raise RuntimeError("音频流已取消")
+            try:
+                data = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if data is None:
+                break
+            data = remainder + data
+            # 保证按完整采样点切分
+            usable = len(data) - len(data) % _BYTES_PER_SAMPLE
+            data, remainder = data[:usable], data[usable:]
+            self.bytes_read += len(data)
+            yield np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+
+        self._check_exit()
+
+    def _check_exit(self):
+        for proc, name, err in zip(self._procs, ("yt-dlp", "ffmpeg"), self._stderr):
+            if proc.wait() != 0:
+                err.seek(0)
+                message = err.read().decode("utf-8", "replace").strip()[-500:]
+                raise RuntimeError(f"音频流失败（{name} 退出码 {proc.returncode}）: {message}")
+
+    def close(self):
+        """终止下载和解码进程"""
+        self._closed.set()
+        for proc in self._procs:
+            if proc.poll() is None:
+                kill_group(proc)
+            proc.wait()
+        if self._reader is not None:
+            self._reader.join(timeout=5)
+        for proc in self._procs:
+            if proc.stdout:
+                proc.stdout.close()
+        for err in self._stderr:
+            err.close()
+
+    def __enter__(self) -> "AudioStream":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+小型 JSON 状态文件的读写
+
+实测统计、基准测试结果等：读取失败（不存在、损坏）时返回默认值；
+写入先写临时文件再原子替换，其他进程不会读到写了一半的内容。
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+
+def read_json(path, default: Any = None) -> Any:
+    path = Path(path).expanduser()
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return default
+
+
+def write_json(path, data: Any, indent: int = 2):
+    path = Path(path).expanduser()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(json.dumps(data, indent=indent, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+yt-dlp 元数据缓存（带 TTL）
+
+`yt-dlp --dump-json` 的结果按视频 ID（无法识别时按 URL 哈希）保存为 info.json 文件，
+下载阶段用 `--load-info-json` 直接复用，避免同一任务重复解析页面。
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from transcript_cache import canonical_video_id
+
+
+class MetadataCache:
+    """按视频 ID 缓存 yt-dlp info.json 文件"""
+
+    def __init__(self, cache_dir: str, ttl: int = 3600):
+        """
+        ttl: 有效期（秒）。视频直链通常几小时后过期，不宜设得太长
+        """
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        # 同一 key 的并发请求只抓取一次
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    @staticmethod
+    def cache_key(url: str) -> str:
+        video_id = canonical_video_id(url)
+        if video_id:
+            return video_id.replace(":", "_")
+        return "url_" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+    def _path(self, url: str) -> Path:
+        return self.cache_dir / f"{self.cache_key(url)}.info.json"
+
+    def get(self, url: str) -> Optional[Path]:
+        """返回未过期的 info.json 路径，没有或已过期返回 None"""
+        path = self._path(url)
+        try:
+            if time.time() - path.stat().st_mtime < self.ttl:
+                return path
+        except OSError:
+            pass
+        return None
+
+    def fetch(self, url: str, timeout: int = 60) -> Optional[Path]:
+        """调用 yt-dlp 抓取元数据并写入缓存，失败返回 None"""
+        try:
+            result = subprocess.run(
+                ['yt-dlp', '--dump-json', '--no-playlist', url],
+                capture_output=True, text=True, timeout=timeout
+            )
+        except Exception:
+            return None
+        if result.returncode != 0 or not result.stdout.strip():
+            return None
+
+        path = self._path(url)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(result.stdout.strip().splitlines()[0], encoding="utf-8")
+        os.replace(tmp_path, path)
+        return path
+
+    def get_or_fetch(self, url: str) -> Optional[Path]:
+        """命中缓存直接返回，否则抓取（同一视频并发请求只抓一次）"""
+        path = self.get(url)
+        if path:
+            return path
+
+        key = self.cache_key(url)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            return self.get(url) or self.fetch(url)
+
+    @staticmethod
+    def load(path: Path) -> Dict[str, Any]:
+        try:
+            return json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def purge(self) -> int:
+        """删除过期的缓存文件，返回删除数量"""
+        removed = 0
+        now = time.time()
+        for path in self.cache_dir.glob("*.info.json"):
+            try:
+                if now - path.stat().st_mtime >= self.ttl:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        return removed
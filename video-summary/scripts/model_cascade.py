@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+置信度级联转录
+
+先用小模型转录整段音频，保留每个分段的置信度（avg_logprob / no_speech_prob），
+只把低置信度的分段合并成区间交给大模型重新解码，再替换回初稿。
+清晰的语音由小模型完成，大模型只处理难的部分。
+"""
+
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+
+# 级联配置
+CASCADE_CONFIG = {
+    "draft_model": "base",        # 初稿模型
+    "min_avg_logprob": -0.6,      # 平均对数概率低于此值的分段重新解码
+    "max_no_speech_prob": 0.6,    # 无语音概率高于此值的分段重新解码（可能是幻觉文本）
+    "merge_gap": 2.0,             # 相距不超过这么多秒的低置信度分段合并为一个区间
+    "padding": 0.3,               # 区间两端各扩展的秒数，避免切断词语
+}
+
+# Whisper 模型尺寸（.en 和版本后缀按基础尺寸比较）
+_MODEL_SIZES = {"tiny": 0, "base": 1, "small": 2, "medium": 3, "large": 4, "turbo": 4}
+
+# redecode(start, end) 返回大模型在该区间的分段（时间已是整段音频的绝对时间）
+Redecoder = Callable[[float, float], List[Dict[str, Any]]]
+
+
+def draft_model_for(model: str, draft_model: str = CASCADE_CONFIG["draft_model"]) -> Optional[str]:
+    """请求的模型比初稿模型大时返回初稿模型，否则返回 None（直接用请求的模型转录）"""
+    def size(name: str) -> Optional[int]:
+        return _MODEL_SIZES.get(name.split(".")[0].split("-")[0])
+
+    requested, draft = size(model), size(draft_model)
+    if requested is None or draft is None or requested <= draft:
+        return None
+    return draft_model
+
+
+def is_low_confidence(
+    seg: Dict[str, Any],
+    min_avg_logprob: float = CASCADE_CONFIG["min_avg_logprob"],
+    max_no_speech_prob: float = CASCADE_CONFIG["max_no_speech_prob"]
+) -> bool:
+    """分段是否需要大模型重新解码；后端没有给出置信度时按低置信度处理"""
+    logprob, no_speech = seg.get("avg_logprob"), seg.get("no_speech_prob")
+    if logprob is None and no_speech is None:
+        return True
+    return (logprob is not None and logprob < min_avg_logprob) or \
+        (no_speech is not None and no_speech > max_no_speech_prob)
+
+
+def redecode_spans(
+    segments: List[Dict[str, Any]],
+    duration: Optional[float] = None,
+    min_avg_logprob: float = CASCADE_CONFIG["min_avg_logprob"],
+    max_no_speech_prob: float = CASCADE_CONFIG["max_no_speech_prob"],
+    merge_gap: float = CASCADE_CONFIG["merge_gap"],
+    padding: float = CASCADE_CONFIG["padding"]
+) -> List[Tuple[float, float]]:
+    """低置信度分段合并后的 (start, end) 区间，按时间排序"""
+    spans: List[Tuple[float, float]] = []
+    for seg in sorted(segments, key=lambda seg: seg["start"]):
+        if not is_low_confidence(seg, min_avg_logprob, max_no_speech_prob):
+            continue
+        start = max(0.0, seg["start"] - padding)
+        end = seg["end"] + padding
+        if duration:
+            end = min(end, duration)
+        if spans and start - spans[-1][1] <= merge_gap:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def _midpoint_in(seg: Dict[str, Any], span: Tuple[float, float]) -> bool:
+    return span[0] <= (seg["start"] + seg["end"]) / 2 < span[1]
+
+
+def splice_segments(
+    draft: List[Dict[str, Any]],
+    spans: List[Tuple[float, float]],
+    redecoded: List[List[Dict[str, Any]]]
+) -> List[Dict[str, Any]]:
+    """
+    用各区间的大模型分段替换初稿中落在区间内的分段
+
+    按分段中点判断归属：区间外的初稿分段保留，区间内的大模型分段采用
+    """
+    kept = [seg for seg in draft if not any(_midpoint_in(seg, span) for span in spans)]
+    for span, segments in zip(spans, redecoded):
+        kept.extend(seg for seg in segments if _midpoint_in(seg, span))
+    return sorted(kept, key=lambda seg: seg["start"])
+
+
+def refine(
+    draft: Dict[str, Any],
+    redecode: Redecoder,
+    duration: Optional[float] = None,
+    cancel=None,
+    **thresholds
+) -> Dict[str, Any]:
+    """
+    对初稿中的低置信度区间重新解码并拼接
+
+    返回新的结果 {"text", "segments", ...}，附 cascade 统计：
+    spans（区间数）、redecoded_seconds（重新解码的音频时长）、
+    redecoded_fraction（占整段音频的比例）、redecode_seconds（重新解码耗时）
+    """
+    options = {key: thresholds.get(key, CASCADE_CONFIG[key])
+               for key in ("min_avg_logprob", "max_no_speech_prob", "merge_gap", "padding")}
+    segments = draft.get("segments", [])
+    spans = redecode_spans(segments, duration, **options)
+
+    started = time.time()
+    redecoded = []
+    for start, end in spans:
+        if cancel is not None and cancel.is_set():
+            raise RuntimeError("级联转录已取消")
+        redecoded.append(redecode(start, end))
+    redecode_seconds = time.time() - started
+
+    spliced = splice_segments(segments, spans, redecoded)
+    redecoded_audio = sum(end - start for start, end in spans)
+    total = duration or (segments[-1]["end"] if segments else 0)
+    return {
+        **draft,
+        "text": "".join(seg["text"] for seg in spliced),
+        "segments": spliced,
+        "cascade": {
+            "spans": len(spans),
+            "redecoded_seconds": round(redecoded_audio, 1),
+            "redecoded_fraction": round(min(1.0, redecoded_audio / total), 3) if total else None,
+            "redecode_seconds": round(redecode_seconds, 1),
+        },
+    }
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+播放列表 / 频道展开
+
+用 yt-dlp 扁平提取（--flat-playlist，不逐个抓取视频页面）列出所有条目，
+每个条目作为独立任务提交。支持增量同步：只取还没同步过的条目。
+"""
+
+import json
+import re
+import subprocess
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+
+# 展开配置
+PLAYLIST_CONFIG = {
+    "first_page": 50,     # 增量同步频道时先取前 N 个条目，全是新条目再翻倍
+    "max_entries": 5000,  # 单次展开的条目上限
+}
+
+
+def is_playlist_url(url: str) -> bool:
+    """是否是播放列表 / 频道 / 合集链接（而不是单个视频）"""
+    url_lower = url.lower()
+    if "youtube.com" in url_lower or "youtu.be" in url_lower:
+        if "list=" in url_lower and "v=" not in url_lower:
+            return True
+        return bool(re.search(r'youtube\.com/(playlist|@[^/?]+|channel/|c/|user/)', url_lower)) \
+            and "/watch" not in url_lower and "/shorts/" not in url_lower
+    if "bilibili.com" in url_lower:
+        return bool(re.search(
+            r'space\.bilibili\.com|/favlist|/medialist|collectiondetail|seriesdetail|/list/', url_lower
+        ))
+    return False
+
+
+def is_channel_url(url: str) -> bool:
+    """是否是频道 / UP 主投稿页：条目按发布时间最新在前，新视频出现在列表开头"""
+    url_lower = url.lower()
+    if "youtube.com" in url_lower:
+        return bool(re.search(r'youtube\.com/(@[^/?]+|channel/|c/|user/)', url_lower)) \
+            and "list=" not in url_lower and "/watch" not in url_lower and "/shorts/" not in url_lower
+    return "space.bilibili.com" in url_lower and not re.search(
+        r'/favlist|/medialist|collectiondetail|seriesdetail|/lists?/', url_lower
+    )
+
+
+def _entry_url(entry: Dict[str, Any]) -> Optional[str]:
+    url = entry.get("webpage_url") or entry.get("url")
+    if url and url.startswith("http"):
+        return url
+    video_id = entry.get("id")
+    if video_id and entry.get("ie_key", "").lower() == "youtube":
+        return f"https://www.youtube.com/watch?v={video_id}"
+    if video_id and str(video_id).startswith("BV"):
+        return f"https://www.bilibili.com/video/{video_id}"
+    return url
+
+
+def flat_extract(url: str, end: Optional[int] = None, timeout: int = 300) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    扁平提取播放列表，返回 (列表标识, 条目列表)
+
+    条目：{"id", "url", "title", "duration"}，顺序与平台一致（频道通常是最新在前）
+    """
+    cmd = ['yt-dlp', '--flat-playlist', '-J', '--no-warnings']
+    if end:
+        cmd += ['--playlist-end', str(end)]
+    result = subprocess.run(cmd + [url], capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise Exception(f"播放列表展开失败: {result.stderr.strip()[:200]}")
+
+    data = json.loads(result.stdout)
+    source = f"{data.get('extractor_key') or data.get('extractor', '')}:{data.get('id') or url}"
+
+    entries = []
+    for entry in data.get("entries") or []:
+        entry_url = _entry_url(entry)
+        if not entry_url:
+            continue
+        entries.append({
+            "id": str(entry.get("id") or entry_url),
+            "url": entry_url,
+            "title": entry.get("title", ""),
+            "duration": entry.get("duration") or 0,
+        })
+    return source, entries
+
+
+def new_entries(
+    url: str,
+    synced: Set[str],
+    first_page: int = PLAYLIST_CONFIG["first_page"],
+    max_entries: int = PLAYLIST_CONFIG["max_entries"]
+) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    增量提取：返回 id 不在 synced 中的条目（保持列表顺序）
+
+    频道最新在前，先只取前 first_page 个条目，页内出现已同步的条目即可停止，
+    没有则翻倍扩大范围，每日同步一个频道通常只需要请求第一页；
+    播放列表 / 合集的新条目可能追加在末尾（最早在前），每次完整展开。
+    """
+    paged = bool(synced) and is_channel_url(url)
+    end = first_page if paged else max_entries
+    while True:
+        source, entries = flat_extract(url, end=end)
+        fresh = [entry for entry in entries if entry["id"] not in synced]
+        if not paged or len(fresh) < len(entries) or len(entries) < end or end >= max_entries:
+            return source, fresh
+        end = min(end * 2, max_entries)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+可终止的子进程
+
+yt-dlp / whisper 在独立的进程组中启动，超时或任务被取消时
+连同它们派生的子进程（ffmpeg 等）一起终止。
+"""
+
+import os
+import signal
+import subprocess
+import threading
+import time
+from typing import List, Optional
+
+
+def popen_group(cmd: List[str], **kwargs) -> subprocess.Popen:
+    """在新的进程组中启动子进程"""
+    return subprocess.Popen(cmd, start_new_session=True, **kwargs)
+
+
+def kill_group(proc: subprocess.Popen):
+    """终止子进程所在的整个进程组"""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class ProcessWatch:
+    """
+    监视子进程：超时或 cancel 被设置时终止其进程组
+
+        with ProcessWatch(proc, timeout, cancel) as watch:
+            proc.communicate()
+        if watch.reason: ...   # None / "timeout" / "cancelled"
+    """
+
+    def __init__(
+        self,
+        proc: subprocess.Popen,
+        timeout: Optional[float] = None,
+        cancel: Optional[threading.Event] = None,
+        interval: float = 0.5
+    ):
+        self.proc = proc
+        self.timeout = timeout
+        self.cancel = cancel
+        self.interval = interval
+        self.reason: Optional[str] = None
+        self._exited = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def _watch(self):
+        deadline = time.time() + self.timeout if self.timeout else None
+        while self.proc.poll() is None:
+            if self.cancel is not None and self.cancel.is_set():
+                self.reason = "cancelled"
+            elif deadline is not None and time.time() > deadline:
+                self.reason = "timeout"
+            if self.reason:
+                kill_group(self.proc)
+                return
+            if self._exited.wait(self.interval):
+                return
+
+    def __enter__(self) -> "ProcessWatch":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        # 调用方异常退出时子进程可能仍在运行
+        if self.proc.poll() is None:
+            kill_group(self.proc)
+        self.proc.wait()
+        self._exited.set()
+        self._thread.join()
+        return False
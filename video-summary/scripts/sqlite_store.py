@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+SQLite 存储的公共部分
+
+任务库、转录缓存和指纹索引用同样的方式访问 SQLite：WAL 模式，
+每个线程一个连接（isolation_level=None，手动控制事务），写操作放在 IMMEDIATE 事务中。
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+class SQLiteStore:
+    """SQLite 存储基类：子类设置 schema（建表语句），打开时自动执行"""
+
+    schema = ""
+    synchronous: Optional[str] = None  # 如 "NORMAL"；None 保持 SQLite 默认
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path).expanduser()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(self.schema)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None：手动控制事务
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            if self.synchronous:
+                conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, fn):
+        """在 IMMEDIATE 事务中执行 fn(conn)，返回其结果"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+字幕来源竞速
+
+同时向所有适用的字幕来源（字幕 API、yt-dlp 人工字幕、yt-dlp 自动字幕、B站播放器 API）发起请求，
+在截止时间内取第一个可用结果并通知其余来源取消。
+每个来源按平台记录耗时和命中率，用于调整发起顺序。
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+from pathlib import Path
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from json_file import read_json, write_json
+
+
+# 字幕来源：接收取消事件，返回字幕文本或 None
+SubtitleSource = Callable[[threading.Event], Optional[str]]
+
+# 竞速配置
+RESOLVER_CONFIG = {
+    "deadline": 20,      # 等待字幕的最长时间（秒）
+    "max_workers": 16,   # 并发探测线程数（所有任务共享）
+}
+
+
+class SubtitleResolver:
+    """并发字幕探测器"""
+
+    def __init__(
+        self,
+        stats_path: str,
+        deadline: float = RESOLVER_CONFIG["deadline"],
+        max_workers: int = RESOLVER_CONFIG["max_workers"]
+    ):
+        self.stats_path = Path(stats_path).expanduser()
+        self.deadline = deadline
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="subtitle")
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = read_json(self.stats_path, {})
+
+    def _record(self, platform: str, source: str, latency: float, hit: bool):
+        with self._lock:
+            stat = self._stats.setdefault(f"{platform}:{source}", {
+                "attempts": 0, "hits": 0, "total_latency": 0.0,
+            })
+            stat["attempts"] += 1
+            stat["hits"] += int(hit)
+            stat["total_latency"] = round(stat["total_latency"] + latency, 3)
+            write_json(self.stats_path, self._stats)
+
+    def _score(self, platform: str, source: str) -> float:
+        """命中率（平滑后）/ 平均耗时，越高越先发起"""
+        stat = self._stats.get(f"{platform}:{source}")
+        if not stat or not stat["attempts"]:
+            return 1.0
+        hit_rate = (stat["hits"] + 1) / (stat["attempts"] + 2)
+        avg_latency = stat["total_latency"] / stat["attempts"]
+        return hit_rate / (1.0 + avg_latency)
+
+    def rank(self, platform: str, names: List[str]) -> List[str]:
+        with self._lock:
+            return sorted(names, key=lambda name: self._score(platform, name), reverse=True)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各平台各来源的尝试次数、命中率和平均耗时"""
+        with self._lock:
+            return {
+                key: {
+                    "attempts": stat["attempts"],
+                    "hit_rate": round(stat["hits"] / stat["attempts"], 3) if stat["attempts"] else 0,
+                    "avg_latency": round(stat["total_latency"] / stat["attempts"], 3) if stat["attempts"] else 0,
+                }
+                for key, stat in self._stats.items()
+            }
+
+    def _run(self, platform: str, name: str, source: SubtitleSource, cancel: threading.Event):
+        started = time.time()
+        try:
+            text = source(cancel)
+        except Exception:
+            text = None
+        # 被取消而没拿到结果的不计入统计，避免拉低慢但可靠的来源
+        if text or not cancel.is_set():
+            self._record(platform, name, time.time() - started, bool(text))
+        return text
+
+    def resolve(
+        self,
+        platform: str,
+        sources: List[Tuple[str, SubtitleSource]],
+        deadline: Optional[float] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        并发探测所有来源，返回 (字幕文本, 来源名)；截止时间内都没有结果返回 (None, None)
+        """
+        if not sources:
+            return None, None
+
+        by_name = dict(sources)
+        cancel = threading.Event()
+        futures = {
+            self._pool.submit(self._run, platform, name, by_name[name], cancel): name
+            for name in self.rank(platform, list(by_name))
+        }
+        try:
+            for future in as_completed(futures, timeout=deadline or self.deadline):
+                text = future.result()
+                if text:
+                    return text, futures[future]
+        except TimeoutError:
+            pass
+        finally:
+            # 通知其余来源尽快放弃
+            cancel.set()
+            for future in futures:
+                future.cancel()
+        return None, None
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+转录任务存储 - SQLite（WAL 模式）
+
+所有任务保存在一张带索引的表里，取代每个任务目录下的 info.json：
+列出任务不再需要遍历目录、逐个解析 JSON，也不会读到写了一半的文件。
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+from sqlite_store import SQLiteStore
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id    TEXT PRIMARY KEY,
+    url        TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    data       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+CREATE INDEX IF NOT EXISTS idx_tasks_url ON tasks(url);
+
+CREATE TABLE IF NOT EXISTS sync_entries (
+    source    TEXT NOT NULL,
+    entry_id  TEXT NOT NULL,
+    synced_at TEXT NOT NULL,
+    PRIMARY KEY (source, entry_id)
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class TaskStore(SQLiteStore):
+    """SQLite 任务表（每个线程一个连接，写操作用 IMMEDIATE 事务保证原子性）"""
+
+    schema = SCHEMA
+    synchronous = "NORMAL"
+
+    @staticmethod
+    def _row(info: Dict[str, Any]) -> tuple:
+        return (
+            info["task_id"],
+            info.get("url", ""),
+            info.get("status", ""),
+            info.get("created_at") or datetime.now().isoformat(),
+            datetime.now().isoformat(),
+            json.dumps(info, ensure_ascii=False),
+        )
+
+    def insert(self, info: Dict[str, Any]):
+        """新增任务（已存在则覆盖）"""
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO tasks "
+            "(task_id, url, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+            self._row(info)
+        ))
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT data FROM tasks WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, task_id: str, **fields) -> Dict[str, Any]:
+        """原子地合并更新部分字段，返回更新后的完整任务信息"""
+        return self._merge(task_id, None, fields)
+
+    def transition(
+        self,
+        task_id: str,
+        from_status: Iterable[str],
+        **fields
+    ) -> Optional[Dict[str, Any]]:
+        """
+        原子状态迁移：仅当当前状态属于 from_status 时更新
+
+        成功返回更新后的任务信息，状态不匹配返回 None
+        """
+        return self._merge(task_id, set(from_status), fields)
+
+    def _merge(self, task_id, from_status, fields) -> Optional[Dict[str, Any]]:
+        def fn(conn):
+            row = conn.execute(
+                "SELECT data FROM tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(f"任务不存在: {task_id}")
+            info = json.loads(row[0])
+            if from_status is not None and info.get("status") not in from_status:
+                return None
+            info.update(fields)
+            conn.execute(
+                "UPDATE tasks SET url = ?, status = ?, updated_at = ?, data = ? WHERE task_id = ?",
+                (info.get("url", ""), info.get("status", ""), datetime.now().isoformat(),
+                 json.dumps(info, ensure_ascii=False), task_id)
+            )
+            return info
+        return self._write(fn)
+
+    def list(
+        self,
+        status: Optional[str] = None,
+        url: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """按创建时间倒序分页列出任务，可按状态 / URL 过滤"""
+        where, params = self._filters(status, url)
+        sql = f"SELECT data FROM tasks{where} ORDER BY created_at DESC"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        return [json.loads(row[0]) for row in self._conn().execute(sql, params)]
+
+    def count(self, status: Optional[str] = None, url: Optional[str] = None) -> int:
+        where, params = self._filters(status, url)
+        return self._conn().execute(f"SELECT COUNT(*) FROM tasks{where}", params).fetchone()[0]
+
+    @staticmethod
+    def _filters(status, url):
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if url:
+            clauses.append("url = ?")
+            params.append(url)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, params
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        ))
+
+    def synced_entries(self, source: str) -> Set[str]:
+        """播放列表 / 频道中已同步过的条目 id"""
+        return {row[0] for row in self._conn().execute(
+            "SELECT entry_id FROM sync_entries WHERE source = ?", (source,)
+        )}
+
+    def mark_synced(self, source: str, entry_ids: Iterable[str]):
+        now = datetime.now().isoformat()
+        self._write(lambda conn: conn.executemany(
+            "INSERT OR IGNORE INTO sync_entries (source, entry_id, synced_at) VALUES (?, ?, ?)",
+            [(source, entry_id, now) for entry_id in entry_ids]
+        ))
+
+    def import_task_dirs(self, task_dir: str, force: bool = False) -> int:
+        """
+        一次性导入旧版任务目录（task_dir/<task_id>/info.json）
+
+        已导入过则跳过（force=True 强制重新扫描），数据库中已有的任务不覆盖。
+        返回导入的任务数。
+        """
+        if self.get_meta("imported_task_dirs") and not force:
+            return 0
+
+        task_dir = Path(task_dir).expanduser()
+        rows = []
+        if task_dir.exists():
+            for task_path in task_dir.iterdir():
+                info_path = task_path / "info.json"
+                if not info_path.is_file():
+                    continue
+                try:
+                    info = json.loads(info_path.read_text())
+                except (json.JSONDecodeError, OSError):
+                    continue
+                info.setdefault("task_id", task_path.name)
+                rows.append(self._row(info))
+
+        def fn(conn):
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks "
+                "(task_id, url, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                ("imported_task_dirs", datetime.now().isoformat())
+            )
+            return conn.total_changes - before - 1
+
+        return self._write(fn)
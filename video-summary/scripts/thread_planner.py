@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+转录线程规划
+
+多个 Whisper 同时运行时，每个都默认占满所有核（torch / OpenMP 线程），
+互相抢占反而让总吞吐下降。这里按可用核数（含 cgroup CPU 配额）把核分给
+转录并发数 × 每个转录的线程数，并根据实测吞吐选择最优组合。
+"""
+
+import math
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from json_file import read_json, write_json
+
+
+# 规划配置
+THREAD_CONFIG = {
+    "default_threads": 4,   # 没有实测数据时每个转录的线程数
+    "min_samples": 3,       # 一个组合至少转录几次才参与比较
+    "poll_interval": 0.5,   # 等待转录名额时检查取消的间隔（秒）
+}
+
+# 控制各数值库线程池大小的环境变量
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+def cpu_quota() -> Optional[float]:
+    """cgroup CPU 配额（可用核数，可为小数）；未限制返回 None"""
+    # cgroup v2：cpu.max 内容为 "<quota> <period>" 或 "max <period>"
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    # cgroup v1
+    try:
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    """实际可用的核数：CPU 亲和性与 cgroup 配额中较小者"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.floor(quota)))
+    return max(1, cpus)
+
+
+def candidate_plans(cores: int) -> List[Tuple[int, int]]:
+    """可选的 (并发数, 每个转录的线程数) 组合，线程数取 2 的幂，并发数 × 线程数 不超过核数"""
+    plans = []
+    threads = 1
+    while threads <= cores:
+        plans.append((cores // threads, threads))
+        threads *= 2
+    return plans
+
+
+def default_plan(cores: int, threads: int = THREAD_CONFIG["default_threads"]) -> Tuple[int, int]:
+    threads = max(1, min(threads, cores))
+    return max(1, cores // threads), threads
+
+
+def limit_threads(threads: int):
+    """
+    限制当前进程及其子进程的数值库线程数
+
+    在加载 torch / numpy 之前设置才对 OpenMP 生效；whisper CLI 子进程和
+    切块转录的 worker 进程继承这些环境变量。已加载 torch 时同时调整其线程数。
+    """
+    for name in _THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+class CoreSlots:
+    """
+    转录名额：每个名额可运行一个 Whisper（每个占 线程数 个核），名额数为转录并发数
+
+    整段转录、切块转录的每一块等凡是运行 Whisper 的地方都先取得名额，
+    切块进程池等转录线程之外的解码也计入同一核数预算
+    """
+
+    def __init__(self, slots: int, poll_interval: float = THREAD_CONFIG["poll_interval"]):
+        self.slots = max(1, slots)
+        self.poll_interval = poll_interval
+        self._semaphore = threading.BoundedSemaphore(self.slots)
+
+    def acquire(self, cancel: Optional[threading.Event] = None):
+        """等待空闲名额；cancel 被设置时抛出异常"""
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise RuntimeError("转录已取消")
+            if self.try_acquire():
+                return
+
+    def try_acquire(self, timeout: Optional[float] = None) -> bool:
+        """最多等待 timeout 秒（默认 poll_interval），取得名额返回 True"""
+        return self._semaphore.acquire(timeout=self.poll_interval if timeout is None else timeout)
+
+    def release(self):
+        self._semaphore.release()
+
+    @contextmanager
+    def hold(self, cancel: Optional[threading.Event] = None):
+        self.acquire(cancel)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class ThreadPlanner:
+    """按实测吞吐选择 并发数 × 线程数 组合"""
+
+    def __init__(self, stats_path: str, min_samples: int = THREAD_CONFIG["min_samples"]):
+        self.stats_path = Path(stats_path).expanduser()
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = read_json(self.stats_path, {})
+
+    @staticmethod
+    def _key(cores: int, workers: int, threads: int) -> str:
+        return f"{cores}:{workers}x{threads}"
+
+    def record(self, cores: int, workers: int, threads: int, audio_seconds: float, seconds: float):
+        """记录一次转录：音频时长和实际耗时"""
+        if audio_seconds <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            stat = self._stats.setdefault(self._key(cores, workers, threads), {
+                "samples": 0, "audio_seconds": 0.0, "seconds": 0.0,
+            })
+            stat["samples"] += 1
+            stat["audio_seconds"] = round(stat["audio_seconds"] + audio_seconds, 3)
+            stat["seconds"] = round(stat["seconds"] + seconds, 3)
+            write_json(self.stats_path, self._stats)
+
+    def _throughput(self, stat: Dict[str, Any], workers: int) -> float:
+        """并发满载时每秒处理的音频秒数：单个转录的速度 × 并发数"""
+        return stat["audio_seconds"] / stat["seconds"] * workers
+
+    def plan(self, cores: int, explore: bool = False) -> Tuple[int, int]:
+        """
+        返回 (并发数, 每个转录的线程数)
+
+        有足够实测数据时取吞吐最高的组合；explore=True 时先依次试用样本不足的组合；
+        都没有数据时用默认线程数。
+        """
+        candidates = candidate_plans(cores)
+        with self._lock:
+            measured = []
+            for workers, threads in candidates:
+                stat = self._stats.get(self._key(cores, workers, threads))
+                if stat and stat["samples"] >= self.min_samples:
+                    measured.append((self._throughput(stat, workers), workers, threads))
+                elif explore:
+                    return workers, threads
+        if measured:
+            _, workers, threads = max(measured)
+            return workers, threads
+        return default_plan(cores)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各组合的样本数、单个转录实时倍速和满载吞吐"""
+        with self._lock:
+            result = {}
+            for key, stat in self._stats.items():
+                workers = int(key.split(":")[1].split("x")[0])
+                result[key] = {
+                    "samples": stat["samples"],
+                    "speed": round(stat["audio_seconds"] / stat["seconds"], 3),
+                    "throughput": round(self._throughput(stat, workers), 3),
+                }
+            return result
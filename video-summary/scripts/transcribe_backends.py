@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+可插拔的转录后端
+
+- cli：调用 openai-whisper 命令行（每次调用重新加载模型）
+- inprocess：进程内常驻的 openai-whisper（WhisperEngine）
+- ctranslate2：faster-whisper（CTranslate2）int8 量化 CPU 推理
+
+所有后端返回与 whisper 同构的结果 {"text", "segments": [{"start", "end", "text"}], "decode_seconds"}。
+基准测试对每个 后端 × 模型 转录同一段本地样本，记录实时率、峰值内存和词错误率，
+自动选择时取满足精度下限的最快后端。
+"""
+
+import importlib.util
+import json
+import multiprocessing
+import re
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional
+
+from json_file import read_json, write_json
+from whisper_engine import WhisperEngine, ModelCache, SegmentCallback, whisper_available, run_whisper_cli, decode_windows
+
+
+# 后端配置
+BACKEND_CONFIG = {
+    "benchmark_path": "~/.cache/video-transcribe/backend_benchmark.json",
+    "max_wer": 0.15,               # 自动选择时允许的最大词错误率
+    "compute_type": "int8",        # ctranslate2 后端的量化类型
+    "fallback_order": ["inprocess", "ctranslate2", "cli"],  # 没有基准测试结果时的选择顺序
+}
+
+
+class TranscribeBackend:
+    """转录后端接口"""
+
+    name = ""
+    supports_stream = False  # 能否直接转录 PCM 块流（边下载边转录）
+    supports_batch = False   # 能否在一次前向中批量转录多段短音频
+
+    @staticmethod
+    def available() -> bool:
+        raise NotImplementedError
+
+    def transcribe(
+        self,
+        audio_path: str,
+        model: str,
+        language: Optional[str],
+        on_segments: Optional[SegmentCallback] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Dict[str, Any]:
+        """cancel 被设置后尽快中止并抛出异常"""
+        raise NotImplementedError
+
+    def transcribe_stream(
+        self,
+        chunks: Iterable,
+        model: str,
+        language: Optional[str],
+        on_segments: Optional[SegmentCallback] = None,
+        cancel: Optional[threading.Event] = None
+    ) -> Dict[str, Any]:
+        """转录 16kHz float32 PCM 块流（supports_stream 为 True 的后端实现）"""
+        raise NotImplementedError(f"{self.name} 后端不支持流式转录")
+
+    def transcribe_batch(
+        self,
+        audio_paths: List[str],
+        model: str,
+        language: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """批量转录多段短音频，结果按输入顺序排列（supports_batch 为 False 的后端逐个转录）"""
+        return [self.transcribe(path, model, language) for path in audio_paths]
+
+    def unload(self):
+        """释放常驻的模型（无常驻状态的后端不需要实现）"""
+
+
+def _checked(on_segments: Optional[SegmentCallback], cancel: threading.Event) -> SegmentCallback:
+    """包装分段回调：取消后在下一次回调时抛出异常"""
+    def callback(segments):
+        if cancel.is_set():
+            raise RuntimeError("转录已取消")
+        if on_segments:
+            on_segments(segments)
+    return callback
+
+
+class WhisperCLIBackend(TranscribeBackend):
+    """openai-whisper 命令行"""
+
+    name = "cli"
+
+    def __init__(self, threads: Optional[int] = None, device: Optional[str] = None, **_):
+        self.threads = threads
+        self.device = device
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which("whisper") is not None
+
+    def transcribe(self, audio_path, model, language, on_segments=None, cancel=None):
+        args = [str(audio_path), '--model', model, '--language', language, '--output_format', 'json']
+        if self.threads:
+            args += ['--threads', str(self.threads)]
+        if self.device:
+            args += ['--device', self.device]
+        with tempfile.TemporaryDirectory(prefix="whisper_") as out_dir:
+            run_whisper_cli(args + ['--output_dir', out_dir], on_segments=on_segments, cancel=cancel)
+            result = json.loads((Path(out_dir) / f"{Path(audio_path).stem}.json").read_text())
+        return {"text": result.get("text", ""), "segments": result.get("segments", []), "decode_seconds": None}
+
+
+class InProcessBackend(TranscribeBackend):
+    """进程内常驻的 openai-whisper"""
+
+    name = "inprocess"
+    supports_stream = True
+    supports_batch = True
+
+    def __init__(self, threads: Optional[int] = None, device: Optional[str] = None, max_models: int = 2, **_):
+        self.engine = WhisperEngine(max_models=max_models, device=device, threads=threads)
+
+    @staticmethod
+    def available() -> bool:
+        return whisper_available()
+
+    def transcribe(self, audio_path, model, language, on_segments=None, cancel=None):
+        # 按窗口解码，每个窗口之间检查是否取消
+        return self.engine.transcribe(
+            audio_path, model=model, language=language,
+            on_segments=_checked(on_segments, cancel) if cancel else on_segments
+        )
+
+    def transcribe_stream(self, chunks, model, language, on_segments=None, cancel=None):
+        return self.engine.transcribe_stream(
+            chunks, model=model, language=language,
+            on_segments=_checked(on_segments, cancel) if cancel else on_segments
+        )
+
+    def transcribe_batch(self, audio_paths, model, language):
+        return self.engine.transcribe_batch(audio_paths, model=model, language=language)
+
+    def unload(self):
+        self.engine.unload()
+
+
+class CTranslate2Backend(TranscribeBackend):
+    """faster-whisper（CTranslate2）量化推理，CPU 上通常比 openai-whisper 快数倍、内存更小"""
+
+    name = "ctranslate2"
+    supports_stream = True
+
+    def __init__(
+        self,
+        threads: Optional[int] = None,
+        device: Optional[str] = None,
+        max_models: int = 2,
+        compute_type: str = BACKEND_CONFIG["compute_type"],
+        **_
+    ):
+        self.threads = threads or 0  # 0 表示由 CTranslate2 自动决定
+        self.device = device or "cpu"
+        self.compute_type = compute_type
+        self._models = ModelCache(self._load_model, max_models)
+
+    @staticmethod
+    def available() -> bool:
+        return importlib.util.find_spec("faster_whisper") is not None
+
+    def _load_model(self, name: str):
+        from faster_whisper import WhisperModel
+        return WhisperModel(name, device=self.device, compute_type=self.compute_type, cpu_threads=self.threads)
+
+    def _get_model(self, name: str):
+        return self._models.get(name)
+
+    def transcribe(self, audio_path, model, language, on_segments=None, cancel=None):
+        from faster_whisper import decode_audio
+        whisper_model, infer_lock = self._get_model(model)
+
+        started = time.time()
+        audio = decode_audio(str(audio_path), sampling_rate=16000)
+        decode_seconds = time.time() - started
+
+        segments = []
+        with infer_lock:
+            # 分段是惰性生成的，边解码边回调
+            pieces, _ = whisper_model.transcribe(audio, language=language, beam_size=5)
+            for piece in pieces:
+                if cancel is not None and cancel.is_set():
+                    raise RuntimeError("转录已取消")
+                seg = {"start": piece.start, "end": piece.end, "text": piece.text,
+                       "avg_logprob": piece.avg_logprob, "no_speech_prob": piece.no_speech_prob}
+                segments.append(seg)
+                if on_segments:
+                    on_segments([seg])
+
+        return {
+            "text": "".join(seg["text"] for seg in segments),
+            "segments": segments,
+            "language": language,
+            "decode_seconds": round(decode_seconds, 3),
+        }
+
+    def transcribe_stream(self, chunks, model, language, on_segments=None, cancel=None):
+        whisper_model, infer_lock = self._get_model(model)
+
+        def decode(piece, prompt):
+            with infer_lock:
+                pieces, _ = whisper_model.transcribe(
+                    piece, language=language, beam_size=5, initial_prompt=prompt
+                )
+                return [
+                    {"start": p.start, "end": p.end, "text": p.text,
+                     "avg_logprob": p.avg_logprob, "no_speech_prob": p.no_speech_prob}
+                    for p in pieces
+                ]
+
+        on_segments = _checked(on_segments, cancel) if cancel else on_segments
+        result = decode_windows(chunks, decode, on_segments or (lambda segments: None))
+        result["language"] = language
+        return result
+
+    def unload(self):
+        self._models.unload()
+
+
+BACKENDS = {cls.name: cls for cls in (WhisperCLIBackend, InProcessBackend, CTranslate2Backend)}
+
+
+def create_backend(name: str, **options) -> TranscribeBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"未知的转录后端: {name}")
+    return BACKENDS[name](**options)
+
+
+def available_backends() -> List[str]:
+    return [name for name, cls in BACKENDS.items() if cls.available()]
+
+
+# === 基准测试 ===
+
+def _tokens(text: str) -> List[str]:
+    # 中日韩文字按字计，其余按词计，忽略大小写和标点
+    return re.findall(r'[぀-ヿ㐀-鿿]|[a-z0-9\']+', text.lower())
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """词错误率：编辑距离 / 参考文本词数"""
+    ref, hyp = _tokens(reference), _tokens(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_token in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_token in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_token != hyp_token),
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def _benchmark_one(
+    backend: str,
+    model: str,
+    sample_path: str,
+    language: str,
+    threads: Optional[int]
+) -> Dict[str, Any]:
+    """在独立进程中运行一次转录，峰值内存只反映该 后端 × 模型（包含 CLI 子进程）"""
+    instance = create_backend(backend, threads=threads, max_models=1)
+    started = time.time()
+    result = instance.transcribe(sample_path, model=model, language=language)
+    seconds = time.time() - started
+    peak_kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return {"text": result.get("text", ""), "seconds": seconds, "peak_rss_mb": round(peak_kb / 1024, 1)}
+
+
+def benchmark_backends(
+    sample_path: str,
+    reference_text: str,
+    models: List[str],
+    backends: Optional[List[str]] = None,
+    language: str = "zh",
+    threads: Optional[int] = None,
+    results_path: str = BACKEND_CONFIG["benchmark_path"]
+) -> List[Dict[str, Any]]:
+    """
+    用每个 后端 × 模型 转录同一段样本，返回并保存
+    [{"backend", "model", "realtime_factor", "peak_rss_mb", "wer", "error"}]
+    """
+    from audio_chunker import probe_duration
+    duration = probe_duration(sample_path)
+    results = []
+    for backend in backends or available_backends():
+        for model in models:
+            entry = {"backend": backend, "model": model}
+            # 每次用新进程：排除模型缓存和前一次运行的内存占用
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                try:
+                    run = pool.submit(_benchmark_one, backend, model, sample_path, language, threads).result()
+                    entry.update({
+                        "realtime_factor": round(run["seconds"] / duration, 3) if duration else None,
+                        "peak_rss_mb": run["peak_rss_mb"],
+                        "wer": round(word_error_rate(reference_text, run["text"]), 4),
+                    })
+                except Exception as e:
+                    entry["error"] = str(e)
+            results.append(entry)
+
+    write_json(results_path, {
+        "sample": str(sample_path),
+        "threads": threads,
+        "created_at": datetime.now().isoformat(),
+        "results": results,
+    })
+    return results
+
+
+def load_benchmark(results_path: str = BACKEND_CONFIG["benchmark_path"]) -> List[Dict[str, Any]]:
+    data = read_json(results_path, {})
+    return data.get("results", []) if isinstance(data, dict) else []
+
+
+def select_backend(
+    model: str,
+    results: List[Dict[str, Any]],
+    max_wer: float = BACKEND_CONFIG["max_wer"],
+    candidates: Optional[List[str]] = None
+) -> Optional[str]:
+    """该模型下满足精度下限的最快后端；没有合格的测试结果返回 None"""
+    qualified = [
+        entry for entry in results
+        if entry["model"] == model and not entry.get("error")
+        and entry.get("wer") is not None and entry["wer"] <= max_wer
+        and entry.get("realtime_factor") is not None
+        and (candidates is None or entry["backend"] in candidates)
+    ]
+    if not qualified:
+        return None
+    return min(qualified, key=lambda entry: entry["realtime_factor"])["backend"]
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+转录后台服务 - 本地 Unix socket API
+
+后台服务常驻进程，持有流水线工作线程和已加载的 Whisper 模型；
+`async_transcriber.py` 的 --status / --list / --cat 等命令只是它的轻量客户端。
+首次提交任务时自动启动服务，收到关闭请求或 SIGTERM 时先处理完已提交的任务再退出。
+
+协议：每个连接发送一行 JSON 请求 {"cmd": ..., "args": {...}}，
+返回一行 JSON 响应 {"ok": true, "result": ...} 或 {"ok": false, "error": ...}。
+"""
+
+import fcntl
+import json
+import os
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+
+# 服务配置
+DAEMON_CONFIG = {
+    "socket_path": "~/.cache/video-transcribe/daemon.sock",
+    "log_path": "~/.cache/video-transcribe/daemon.log",
+    "start_timeout": 15,     # 自动启动后等待服务就绪的时间（秒）
+    "drain_timeout": 3600,   # 关闭时等待已提交任务完成的时间（秒）
+}
+
+
+class DaemonUnavailable(Exception):
+    """后台服务未运行或无法连接"""
+
+
+# === 客户端 ===
+
+class DaemonClient:
+    """后台服务客户端"""
+
+    def __init__(self, socket_path: str = DAEMON_CONFIG["socket_path"]):
+        self.socket_path = str(Path(socket_path).expanduser())
+
+    def call(self, cmd: str, socket_timeout: Optional[float] = 30, **args) -> Any:
+        """
+        发送请求并返回结果；服务不可用抛 DaemonUnavailable，服务端出错抛 RuntimeError
+
+        socket_timeout 为 None 时一直等待（用于 wait 长轮询）
+        """
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(socket_timeout)
+                sock.connect(self.socket_path)
+                sock.sendall((json.dumps({"cmd": cmd, "args": args}) + "\n").encode("utf-8"))
+                data = b""
+                while not data.endswith(b"\n"):
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    data += chunk
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise DaemonUnavailable(str(e))
+
+        response = json.loads(data.decode("utf-8"))
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "未知错误"))
+        return response.get("result")
+
+    def is_running(self) -> bool:
+        try:
+            self.call("ping", socket_timeout=2)
+            return True
+        except (DaemonUnavailable, OSError, ValueError, RuntimeError):
+            return False
+
+    def ensure_running(self, start_timeout: float = DAEMON_CONFIG["start_timeout"]) -> bool:
+        """服务未运行则在后台启动，等待就绪；启动失败返回 False"""
+        if self.is_running():
+            return True
+
+        log_path = Path(DAEMON_CONFIG["log_path"]).expanduser()
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, "ab") as log:
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--serve", self.socket_path],
+                stdin=subprocess.DEVNULL, stdout=log, stderr=log,
+                start_new_session=True,  # 脱离当前终端，CLI 退出后继续运行
+            )
+
+        deadline = time.time() + start_timeout
+        while time.time() < deadline:
+            if self.is_running():
+                return True
+            time.sleep(0.1)
+        return False
+
+
+# === 服务端 ===
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line.decode("utf-8"))
+            result = self.server.daemon.dispatch(request.get("cmd"), request.get("args") or {})
+            response = {"ok": True, "result": result}
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+        self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class TranscribeDaemon:
+    """转录后台服务"""
+
+    def __init__(self, socket_path: str = DAEMON_CONFIG["socket_path"]):
+        # 延迟导入：客户端不需要加载转录器
+        import async_transcriber
+        self.api = async_transcriber
+        self.transcriber = async_transcriber.transcriber
+
+        self.socket_path = Path(socket_path).expanduser()
+        self.started_at = time.time()
+        self._draining = False
+        self._server: Optional[_Server] = None
+
+    def dispatch(self, cmd: str, args: Dict[str, Any]) -> Any:
+        api = self.api
+        if cmd == "ping":
+            return {
+                "pid": os.getpid(),
+                "uptime": round(time.time() - self.started_at, 1),
+                "draining": self._draining,
+            }
+        if cmd == "submit":
+            if self._draining:
+                raise RuntimeError("服务正在关闭，不再接受新任务")
+            return api.submit_task(**args)
+        if cmd == "submit_many":
+            if self._draining:
+                raise RuntimeError("服务正在关闭，不再接受新任务")
+            return api.submit_many(**args)
+        if cmd == "sync":
+            if self._draining:
+                raise RuntimeError("服务正在关闭，不再接受新任务")
+            return api.submit_playlist(**args)
+        if cmd == "status":
+            return api.check_task(args["task_id"])
+        if cmd == "list":
+            return self.transcriber.list_tasks(**args)
+        if cmd == "stats":
+            return self.transcriber.stats()
+        if cmd == "cat":
+            return self.transcriber.get_transcript(**args)
+        if cmd == "cancel":
+            return api.cancel_task(**args)
+        if cmd == "wait":
+            return api.wait_task(**args)
+        if cmd == "wait_any":
+            return api.wait_any(**args)
+        if cmd == "partial":
+            return api.get_partial_transcript(**args)
+        if cmd == "resume":
+            if self._draining:
+                raise RuntimeError("服务正在关闭，不再接受新任务")
+            return self.transcriber.resume_tasks(**args)
+        if cmd == "shutdown":
+            threading.Thread(
+                target=self.shutdown, args=(args.get("drain_timeout"),), daemon=True
+            ).start()
+            return {"draining": True}
+        raise ValueError(f"未知命令: {cmd}")
+
+    def serve_forever(self):
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # 文件锁保证只有一个服务实例（多个客户端同时自动启动时）
+        lock_file = open(self.socket_path.with_suffix(".lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            print("服务已在运行", file=sys.stderr)
+            return
+
+        # 上次异常退出残留的 socket 文件
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+        self._server = _Server(str(self.socket_path), _Handler)
+        self._server.daemon = self
+        os.chmod(self.socket_path, 0o600)
+
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: threading.Thread(target=self.shutdown, daemon=True).start())
+
+        print(f"转录服务已启动: {self.socket_path} (pid {os.getpid()})", flush=True)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if self.socket_path.exists():
+                self.socket_path.unlink()
+            lock_file.close()
+            print("转录服务已退出", flush=True)
+
+    def shutdown(self, drain_timeout: Optional[float] = None):
+        """优雅关闭：拒绝新任务，等待已提交任务完成后退出"""
+        if self._draining:
+            return
+        self._draining = True
+        print("正在关闭，等待已提交任务完成...", flush=True)
+        self.transcriber.drain(drain_timeout or DAEMON_CONFIG["drain_timeout"])
+        if self._server is not None:
+            self._server.shutdown()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "--serve":
+        socket_path = sys.argv[2] if len(sys.argv) > 2 else DAEMON_CONFIG["socket_path"]
+        TranscribeDaemon(socket_path).serve_forever()
+    else:
+        print("用法: python transcribe_daemon.py --serve [socket_path]")
+        sys.exit(1)
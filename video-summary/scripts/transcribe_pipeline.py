@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+分阶段转录流水线
+
+每个阶段（字幕探测、下载、转录、格式化）有独立的有界线程池，
+阶段之间用优先队列衔接。下一个视频的下载可以和当前视频的转录重叠，
+而 CPU 密集的转录阶段并发数受核数预算限制。
+指定阶段还可以按分组（如平台）限制并发，超限的 job 暂缓，不占用工作线程；
+也可以把队列中可合并的 job 一次取出，交给批处理函数一起处理。
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+
+# 阶段处理函数：接收 job，返回下一阶段名；返回 None 表示 job 结束
+StageHandler = Callable[[Dict[str, Any]], Optional[str]]
+
+# 批处理函数：接收一批 job，按顺序返回每个 job 的下一阶段名（None 表示结束）或异常
+BatchHandler = Callable[[List[Dict[str, Any]]], List[Any]]
+
+
+class StagePipeline:
+    """分阶段流水线"""
+
+    def __init__(
+        self,
+        stages: List[Tuple[str, StageHandler, int]],
+        on_error: Optional[Callable[[Dict[str, Any], Exception], None]] = None,
+        priority_key: Optional[Callable[[Dict[str, Any]], tuple]] = None,
+        group_key: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None,
+        group_limits: Optional[Dict[str, int]] = None,
+        limited_stages: Optional[List[str]] = None,
+        batch_stages: Optional[Dict[str, Tuple[Callable[[Dict[str, Any]], Any], int, BatchHandler]]] = None
+    ):
+        """
+        stages: [(阶段名, 处理函数, 并发数), ...]，按顺序排列，第一个为入口阶段
+        on_error: 处理函数抛出异常时的回调，job 随后被丢弃
+        priority_key: 排序键，越小越先处理；相同时先进先出
+        group_key / group_limits / limited_stages:
+            在 limited_stages 中，同一分组（如平台）同时运行的 job 数不超过 group_limits[分组]
+            （"*" 为默认上限，未配置则不限）
+        batch_stages: {阶段名: (batch_key, 批大小上限, 批处理函数)}
+            工作线程取到 batch_key 不为 None 的 job 时，把队列中 batch_key 相同的其他 job
+            按优先级一并取出（最多凑满批大小），交给批处理函数；只有一个 job 时仍走普通处理函数。
+            批处理阶段不应同时按分组限流（分组名额只按第一个 job 计）
+        """
+        if not stages:
+            raise ValueError("至少需要一个阶段")
+
+        self._order = [name for name, _, _ in stages]
+        self._handlers: Dict[str, StageHandler] = {}
+        self._workers: Dict[str, int] = {}
+        self._queues: Dict[str, queue.Queue] = {}
+        for name, handler, workers in stages:
+            self._handlers[name] = handler
+            self._workers[name] = max(1, int(workers))
+            self._queues[name] = queue.PriorityQueue()
+
+        self._on_error = on_error
+        self._priority_key = priority_key or (lambda job: (0,))
+        self._seq = itertools.count()
+
+        self._group_key = group_key
+        self._group_limits = group_limits or {}
+        self._limited_stages = set(limited_stages or [])
+        self._batch_stages = batch_stages or {}
+        self._group_running: Dict[str, int] = defaultdict(int)
+        # 因分组并发已满而暂缓的 job，按优先级排成堆：(排序键, 序号, 阶段, job)
+        self._deferred: Dict[str, list] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending = 0
+        self._busy = {name: 0 for name in self._order}
+        self._started = False
+
+    @property
+    def stages(self) -> List[str]:
+        """阶段名，按流水线顺序"""
+        return list(self._order)
+
+    def start(self):
+        """启动各阶段的工作线程（重复调用无副作用）"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        for name in self._order:
+            for i in range(self._workers[name]):
+                thread = threading.Thread(
+                    target=self._worker, args=(name,),
+                    name=f"pipeline-{name}-{i}", daemon=True
+                )
+                thread.start()
+
+    def submit(self, job: Dict[str, Any], stage: Optional[str] = None):
+        """提交 job，默认进入第一个阶段"""
+        stage = stage or self._order[0]
+        if stage not in self._queues:
+            raise ValueError(f"未知阶段: {stage}")
+
+        self.start()
+        with self._lock:
+            self._pending += 1
+        self._put(stage, job)
+
+    def _put(self, stage: str, job: Dict[str, Any]):
+        self._queues[stage].put((self._priority_key(job), next(self._seq), job))
+
+    def _group_limit(self, group: str) -> Optional[int]:
+        return self._group_limits.get(group, self._group_limits.get("*"))
+
+    def _try_acquire_group(self, name: str, job: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
+        """占用分组并发名额；已满则暂缓该 job，返回 (False, 分组)"""
+        if name not in self._limited_stages or self._group_key is None:
+            return True, None
+        group = self._group_key(job)
+        limit = self._group_limit(group) if group else None
+        if limit is None:
+            return True, None
+        if self._group_running[group] >= limit:
+            heapq.heappush(
+                self._deferred[group], (self._priority_key(job), next(self._seq), name, job)
+            )
+            return False, group
+        self._group_running[group] += 1
+        return True, group
+
+    def _release_group(self, group: Optional[str]):
+        """释放分组名额，放回优先级最高的暂缓 job（调用方持有锁）"""
+        if group is None:
+            return
+        self._group_running[group] -= 1
+        if self._deferred[group]:
+            _, _, stage, job = heapq.heappop(self._deferred[group])
+            self._put(stage, job)
+
+    def _take_batch(self, name: str, job: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """从队列中取出可与 job 合并处理的其他 job（调用方持有锁）"""
+        if name not in self._batch_stages:
+            return [job]
+        batch_key, max_batch, _ = self._batch_stages[name]
+        key = batch_key(job)
+        if key is None or max_batch <= 1:
+            return [job]
+
+        q = self._queues[name]
+        batch = [job]
+        with q.mutex:
+            for item in sorted(q.queue):
+                if len(batch) >= max_batch:
+                    break
+                if batch_key(item[2]) == key:
+                    batch.append(item[2])
+            if len(batch) > 1:
+                taken = {id(other) for other in batch[1:]}
+                q.queue[:] = [item for item in q.queue if id(item[2]) not in taken]
+                heapq.heapify(q.queue)
+        return batch
+
+    def _report_error(self, job: Dict[str, Any], error: Exception):
+        if self._on_error:
+            try:
+                self._on_error(job, error)
+            except Exception:
+                pass
+
+    def _run(self, name: str, batch: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """处理一个 job 或一批 job，返回各自的下一阶段（出错的为 None）"""
+        if len(batch) > 1:
+            try:
+                outcomes = list(self._batch_stages[name][2](batch))
+                if len(outcomes) != len(batch):
+                    raise ValueError(f"批处理返回 {len(outcomes)} 个结果，应为 {len(batch)} 个")
+            except Exception as e:
+                outcomes = [e] * len(batch)
+        else:
+            try:
+                outcomes = [self._handlers[name](batch[0])]
+            except Exception as e:
+                outcomes = [e]
+
+        next_stages = []
+        for job, outcome in zip(batch, outcomes):
+            if not isinstance(outcome, Exception) and outcome is not None \
+                    and outcome not in self._queues:
+                outcome = ValueError(f"未知阶段: {outcome}")
+            if isinstance(outcome, Exception):
+                self._report_error(job, outcome)
+                outcome = None
+            next_stages.append(outcome)
+        return next_stages
+
+    def _worker(self, name: str):
+        q = self._queues[name]
+
+        while True:
+            _, _, job = q.get()
+            with self._lock:
+                acquired, group = self._try_acquire_group(name, job)
+                if not acquired:
+                    q.task_done()
+                    continue
+                batch = self._take_batch(name, job)
+                self._busy[name] += 1
+
+            next_stages = self._run(name, batch)
+
+            with self._lock:
+                self._release_group(group)
+                for job, next_stage in zip(batch, next_stages):
+                    if next_stage is not None:
+                        # 交给下一阶段，pending 计数不变
+                        self._put(next_stage, job)
+                    else:
+                        self._pending -= 1
+                self._busy[name] -= 1
+                if self._pending == 0:
+                    self._idle.notify_all()
+            for _ in batch:
+                q.task_done()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """等待所有已提交的 job 结束，超时返回 False"""
+        with self._lock:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """各阶段的排队数、运行数和并发上限，以及各分组的运行 / 暂缓数"""
+        with self._lock:
+            stats = {
+                name: {
+                    "queued": self._queues[name].qsize(),
+                    "running": self._busy[name],
+                    "workers": self._workers[name],
+                }
+                for name in self._order
+            }
+            stats["groups"] = {
+                group: {"running": self._group_running[group], "deferred": len(self._deferred[group])}
+                for group in set(self._group_running) | set(self._deferred)
+            }
+            return stats
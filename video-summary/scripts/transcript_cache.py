@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+转录结果缓存 - 按规范化视频 ID 寻址
+
+同一个视频无论以哪种 URL 提交（youtu.be / youtube.com/watch?v= / shorts 等），
+都映射到同一个平台 ID；相同模型和语言处理过的视频直接复用转录结果。
+"""
+
+import json
+import re
+from datetime import datetime
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse, parse_qs
+
+from sqlite_store import SQLiteStore
+
+
+# 缓存配置
+CACHE_CONFIG = {
+    "max_bytes": 200 * 1024 * 1024,  # 转录文本总大小上限
+    "max_entries": 5000,             # 条目数上限
+}
+
+# 平台字幕与模型无关，统一用这个“模型名”缓存
+SUBTITLE_MODEL = "subtitle"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    cache_key   TEXT PRIMARY KEY,
+    video_id    TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    language    TEXT NOT NULL,
+    transcript  TEXT NOT NULL,
+    video_info  TEXT NOT NULL,
+    output_path TEXT,
+    size        INTEGER NOT NULL,
+    created_at  TEXT NOT NULL,
+    last_used   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transcripts_video ON transcripts(video_id);
+CREATE INDEX IF NOT EXISTS idx_transcripts_last_used ON transcripts(last_used);
+"""
+
+
+def canonical_video_id(url: str) -> Optional[str]:
+    """
+    把视频 URL 规范化为平台 ID，无法识别返回 None
+
+    - YouTube: youtube:<11 位 ID>
+    - B站: bilibili:<BV 号或 av 号>:p<分P>
+    - 抖音: douyin:<作品 ID>
+    """
+    parsed = urlparse(url.strip())
+    host = (parsed.netloc or "").lower()
+    query = parse_qs(parsed.query)
+
+    if "youtube.com" in host or "youtu.be" in host:
+        match = (
+            re.search(r'youtu\.be/([a-zA-Z0-9_-]{11})', url)
+            or re.search(r'/(?:shorts|embed|live|v)/([a-zA-Z0-9_-]{11})', parsed.path)
+        )
+        video_id = match.group(1) if match else (query.get("v") or [""])[0]
+        if re.fullmatch(r'[a-zA-Z0-9_-]{11}', video_id or ""):
+            return f"youtube:{video_id}"
+        return None
+
+    if "bilibili.com" in host:
+        match = re.search(r'(BV[a-zA-Z0-9]{10})', parsed.path) or \
+            re.search(r'/(av\d+)', parsed.path, re.IGNORECASE)
+        if not match:
+            return None
+        page = (query.get("p") or ["1"])[0]
+        page = int(page) if page.isdigit() else 1
+        return f"bilibili:{match.group(1)}:p{page}"
+
+    if "douyin.com" in host:
+        match = re.search(r'/video/(\d+)', parsed.path)
+        modal = (query.get("modal_id") or [""])[0]
+        video_id = match.group(1) if match else modal
+        if video_id.isdigit():
+            return f"douyin:{video_id}"
+        return None
+
+    return None
+
+
+class TranscriptCache(SQLiteStore):
+    """持久化转录缓存（SQLite，LRU 淘汰）"""
+
+    schema = SCHEMA
+
+    def __init__(
+        self,
+        db_path: str,
+        max_bytes: int = CACHE_CONFIG["max_bytes"],
+        max_entries: int = CACHE_CONFIG["max_entries"]
+    ):
+        super().__init__(db_path)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+    @staticmethod
+    def _key(video_id: str, model: str, language: str) -> str:
+        return f"{video_id}|{model}|{language}"
+
+    def get(self, video_id: str, model: str, language: str) -> Optional[Dict[str, Any]]:
+        """
+        查找缓存：优先同模型结果，其次平台字幕结果（与模型无关）
+
+        返回 {"video_id", "model", "language", "transcript", "video_info", "output_path"}
+        """
+        conn = self._conn()
+        for m in (model, SUBTITLE_MODEL):
+            key = self._key(video_id, m, language)
+            row = conn.execute(
+                "SELECT model, transcript, video_info, output_path FROM transcripts "
+                "WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE transcripts SET last_used = ? WHERE cache_key = ?",
+                    (datetime.now().isoformat(), key)
+                )
+                return {
+                    "video_id": video_id,
+                    "model": row[0],
+                    "language": language,
+                    "transcript": row[1],
+                    "video_info": json.loads(row[2]),
+                    "output_path": row[3],
+                }
+        return None
+
+    def put(
+        self,
+        video_id: str,
+        model: str,
+        language: str,
+        transcript: str,
+        video_info: Dict[str, Any],
+        output_path: Optional[str] = None
+    ):
+        """写入缓存，超出上限时淘汰最久未用的条目"""
+        now = datetime.now().isoformat()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO transcripts "
+            "(cache_key, video_id, model, language, transcript, video_info, output_path, "
+            " size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self._key(video_id, model, language), video_id, model, language, transcript,
+             json.dumps(video_info, ensure_ascii=False), output_path,
+             len(transcript.encode("utf-8")), now, now)
+        )
+        self.evict()
+
+    def evict(self) -> int:
+        """按 LRU 淘汰到容量以内，返回淘汰条数"""
+        conn = self._conn()
+        removed = 0
+        while True:
+            count, total = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts"
+            ).fetchone()
+            if count <= self.max_entries and total <= self.max_bytes:
+                return removed
+            conn.execute(
+                "DELETE FROM transcripts WHERE cache_key = "
+                "(SELECT cache_key FROM transcripts ORDER BY last_used LIMIT 1)"
+            )
+            removed += 1
+
+    def invalidate(self, video_id: str):
+        """删除某个视频的所有缓存"""
+        self._conn().execute("DELETE FROM transcripts WHERE video_id = ?", (video_id,))
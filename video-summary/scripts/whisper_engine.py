@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+常驻进程内的 Whisper 转录引擎
+
+模型按大小加载一次后常驻内存，服务多个音频文件，
+避免每个任务调用 whisper CLI 时重复加载权重、初始化 torch。
+最多保留 N 个模型（LRU 淘汰）。
+"""
+
+import importlib.util
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Callable, Dict, Any, Iterable, List, Optional
+
+
+# 每解码完一批分段回调一次：on_segments([{"start", "end", "text"}, ...])
+SegmentCallback = Callable[[List[Dict[str, Any]]], None]
+
+SAMPLE_RATE = 16000
+
+
+def whisper_available() -> bool:
+    """是否安装了 openai-whisper（只查找模块，不导入：导入会加载 torch）"""
+    return importlib.util.find_spec("whisper") is not None
+
+
+class ModelCache:
+    """
+    常驻模型的 LRU 缓存（线程安全）
+
+    get(name) 返回 (模型, 推理锁)，未加载时调用 loader(name) 加载；
+    超过 max_models 时淘汰最久未用的模型
+    """
+
+    def __init__(self, loader: Callable[[str], Any], max_models: int = 2):
+        self.loader = loader
+        self.max_models = max(1, max_models)
+        self._lock = threading.Lock()
+        # model_name -> (model, 推理锁)
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+
+    def get(self, name: str):
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name]
+
+            entry = (self.loader(name), threading.Lock())
+            self._models[name] = entry
+            while len(self._models) > self.max_models:
+                # 正在使用被淘汰模型的调用方仍持有引用，用完后自动释放
+                self._models.popitem(last=False)
+            return entry
+
+    def names(self) -> List[str]:
+        """当前常驻的模型（最近使用的在后）"""
+        with self._lock:
+            return list(self._models.keys())
+
+    def unload(self, name: Optional[str] = None):
+        """卸载指定模型，name 为空时全部卸载"""
+        with self._lock:
+            if name is None:
+                self._models.clear()
+            else:
+                self._models.pop(name, None)
+
+
+class WhisperEngine:
+    """进程内 Whisper 引擎（线程安全）"""
+
+    def __init__(
+        self,
+        max_models: int = 2,
+        device: Optional[str] = None,
+        threads: Optional[int] = None
+    ):
+        self.device = device
+        self.threads = threads
+        self._models = ModelCache(self._load_model, max_models)
+        self._torch_ready = False
+
+    def _init_torch(self):
+        if self._torch_ready:
+            return
+        import torch
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        self._torch_ready = True
+
+    def _load_model(self, name: str):
+        import whisper
+        self._init_torch()
+        return whisper.load_model(name, device=self.device)
+
+    def _get_model(self, name: str):
+        """获取 (模型, 推理锁)，未加载则加载；超过上限时淘汰最久未用的模型"""
+        return self._models.get(name)
+
+    def transcribe(
+        self,
+        audio_path: str,
+        model: str = "small",
+        language: Optional[str] = "zh",
+        on_segments: Optional[SegmentCallback] = None,
+        window_seconds: float = 120,
+        **options
+    ) -> Dict[str, Any]:
+        """
+        转录音频文件
+
+        返回 whisper 原生结果：{"text", "segments": [{"start", "end", "text", ...}], "language"}，
+        另附 decode_seconds（音频解码为 16kHz PCM 的耗时）
+        传入 on_segments 时按窗口解码，每个窗口的分段解码完立即回调
+        """
+        import whisper
+        whisper_model, infer_lock = self._get_model(model)
+        options.setdefault("fp16", whisper_model.device.type == "cuda")
+
+        # 先单独解码音频，便于统计不同下载格式的解码开销
+        started = time.time()
+        audio = whisper.load_audio(str(audio_path))
+        decode_seconds = time.time() - started
+
+        if on_segments is None:
+            # 同一模型的推理串行执行，不同模型可以并行
+            with infer_lock:
+                result = whisper_model.transcribe(audio, language=language, **options)
+        else:
+            result = self._transcribe_windows(
+                whisper_model, infer_lock, [audio], language, on_segments, window_seconds, options
+            )
+        result["decode_seconds"] = round(decode_seconds, 3)
+        return result
+
+    def transcribe_stream(
+        self,
+        chunks: Iterable,
+        model: str = "small",
+        language: Optional[str] = "zh",
+        on_segments: Optional[SegmentCallback] = None,
+        window_seconds: float = 120,
+        **options
+    ) -> Dict[str, Any]:
+        """
+        转录 16kHz float32 PCM 块流（如边下载边解码的音频），凑满一个窗口就解码
+
+        推理锁只在每个窗口解码时持有，等待下载时不阻塞同模型的其他任务
+        """
+        whisper_model, infer_lock = self._get_model(model)
+        options.setdefault("fp16", whisper_model.device.type == "cuda")
+        return self._transcribe_windows(
+            whisper_model, infer_lock, chunks, language,
+            on_segments or (lambda segments: None), window_seconds, options
+        )
+
+    @staticmethod
+    def _transcribe_windows(
+        whisper_model,
+        infer_lock,
+        chunks: Iterable,
+        language: Optional[str],
+        on_segments: SegmentCallback,
+        window_seconds: float,
+        options: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        def decode(piece, prompt):
+            with infer_lock:
+                result = whisper_model.transcribe(
+                    piece, language=language, initial_prompt=prompt, **options
+                )
+            return result.get("segments", [])
+
+        prompt = options.pop("initial_prompt", None)
+        result = decode_windows(chunks, decode, on_segments, window_seconds, prompt)
+        result["language"] = language
+        return result
+
+    def transcribe_batch(
+        self,
+        audio_paths: List[str],
+        model: str = "small",
+        language: Optional[str] = "zh",
+        **options
+    ) -> List[Dict[str, Any]]:
+        """
+        一次前向批量转录多段短音频
+
+        每段音频切成 30 秒窗口，所有窗口的 mel 频谱补齐后堆成一个批次，
+        在同一个已加载的模型上调用 whisper.decode，结果按音频拆回。
+        窗口之间不做 seek 续接，适合几十秒的短视频。返回值与 transcribe 同构，按输入顺序排列
+        """
+        import torch
+        import whisper
+        from whisper.audio import N_SAMPLES
+        from whisper.tokenizer import get_tokenizer
+
+        whisper_model, infer_lock = self._get_model(model)
+        fp16 = options.pop("fp16", whisper_model.device.type == "cuda")
+
+        started = time.time()
+        audios = [whisper.load_audio(str(path)) for path in audio_paths]
+        decode_seconds = (time.time() - started) / max(1, len(audios))
+
+        windows = []  # (音频序号, 窗口起点秒, 窗口终点秒)
+        mels = []
+        for index, audio in enumerate(audios):
+            duration = len(audio) / SAMPLE_RATE
+            for start in range(0, max(1, len(audio)), N_SAMPLES):
+                piece = whisper.pad_or_trim(audio[start:start + N_SAMPLES])
+                mels.append(whisper.log_mel_spectrogram(piece, whisper_model.dims.n_mels))
+                windows.append((index, start / SAMPLE_RATE, min(duration, (start + N_SAMPLES) / SAMPLE_RATE)))
+
+        decode_options = whisper.DecodingOptions(language=language, fp16=fp16, **options)
+        with infer_lock:
+            decoded = whisper.decode(whisper_model, torch.stack(mels).to(whisper_model.device), decode_options)
+
+        tokenizer = get_tokenizer(
+            whisper_model.is_multilingual,
+            num_languages=getattr(whisper_model, "num_languages", 99),
+            language=language, task="transcribe",
+        )
+        results = [
+            {"segments": [], "language": language, "decode_seconds": round(decode_seconds, 3)}
+            for _ in audios
+        ]
+        for (index, start, end), window in zip(windows, decoded):
+            # 与 whisper.transcribe 相同的静音判定
+            if window.no_speech_prob > 0.6 and window.avg_logprob < -1:
+                continue
+            for seg in _timestamp_segments(window.tokens, tokenizer, start, end):
+                seg.update(avg_logprob=window.avg_logprob, no_speech_prob=window.no_speech_prob)
+                results[index]["segments"].append(seg)
+        for result in results:
+            result["text"] = "".join(seg["text"] for seg in result["segments"])
+        return results
+
+    def loaded_models(self) -> List[str]:
+        """当前常驻的模型（最近使用的在后）"""
+        return self._models.names()
+
+    def unload(self, name: Optional[str] = None):
+        """卸载指定模型，name 为空时全部卸载"""
+        self._models.unload(name)
+
+
+def _timestamp_segments(tokens: List[int], tokenizer, offset: float, end: float) -> List[Dict[str, Any]]:
+    """
+    按时间戳 token 把一个 30 秒窗口的解码结果拆成分段
+
+    token 序列形如 <|0.00|> 文本 <|2.40|><|2.40|> 文本 <|5.00|>，时间戳精度 0.02 秒；
+    末尾没有闭合时间戳的文本以窗口终点结束
+    """
+    segments = []
+    start: Optional[float] = None
+    last = 0.0  # 上一个闭合时间戳
+    text_tokens: List[int] = []
+    for token in tokens:
+        if token < tokenizer.timestamp_begin:
+            text_tokens.append(token)
+            continue
+        position = (token - tokenizer.timestamp_begin) * 0.02
+        if start is None:
+            start = position
+            continue
+        if text_tokens:
+            segments.append({
+                "start": offset + start, "end": offset + position,
+                "text": tokenizer.decode(text_tokens),
+            })
+        start, last, text_tokens = None, position, []
+    if text_tokens:
+        segments.append({
+            "start": offset + (last if start is None else start), "end": end,
+            "text": tokenizer.decode(text_tokens),
+        })
+    return [seg for seg in segments if seg["text"].strip()]
+
+
+# whisper CLI 逐段打印的行：[00:01.000 --> 00:05.000]  文本（超过 1 小时带小时位）
+_CLI_SEGMENT_RE = re.compile(r'^\[((?:\d+:)?\d+:\d+\.\d+) --> ((?:\d+:)?\d+:\d+\.\d+)\]\s*(.*)$')
+
+
+def _parse_timestamp(value: str) -> float:
+    seconds = 0.0
+    for part in value.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def run_whisper_cli(
+    args: List[str],
+    on_segments: Optional[SegmentCallback] = None,
+    timeout: float = 3600,
+    cancel: Optional[threading.Event] = None
+):
+    """
+    运行 whisper CLI（args 为 `whisper` 之后的参数），结果由 CLI 写入 --output_dir
+
+    stdout 逐行读取：分段行解析出时间戳交给 on_segments 后即丢弃，不在内存中累积；
+    其余输出只保留最后几行用于报错。退出码非 0、超时或 cancel 被设置时
+    终止 whisper 进程组并抛 RuntimeError。
+    """
+    from process_control import popen_group, ProcessWatch
+    env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+    proc = popen_group(
+        ['whisper', *args, '--verbose', 'True'],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, encoding="utf-8", errors="replace", env=env,
+    )
+    tail: deque = deque(maxlen=20)
+    with proc.stdout, ProcessWatch(proc, timeout, cancel) as watch:
+        for line in proc.stdout:
+            match = _CLI_SEGMENT_RE.match(line.strip())
+            if not match:
+                if line.strip():
+                    tail.append(line.rstrip())
+                continue
+            if on_segments:
+                on_segments([{
+                    "start": _parse_timestamp(match.group(1)),
+                    "end": _parse_timestamp(match.group(2)),
+                    "text": match.group(3).strip(),
+                }])
+
+    if watch.reason == "cancelled":
+        raise RuntimeError("whisper 转录已取消")
+    if watch.reason == "timeout":
+        raise RuntimeError(f"whisper 转录超时（{timeout} 秒）: " + "\n".join(tail)[-500:])
+    if proc.returncode != 0:
+        raise RuntimeError(f"whisper 转录失败（退出码 {proc.returncode}）: " + "\n".join(tail)[-500:])
+
+
+def decode_windows(
+    chunks: Iterable,
+    decode: Callable[[Any, Optional[str]], List[Dict[str, Any]]],
+    on_segments: SegmentCallback,
+    window_seconds: float = 120,
+    prompt: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    按窗口增量解码 16kHz float32 PCM 块流
+
+    decode(窗口音频, 提示文本) 返回时间相对窗口起点的分段。
+    与 whisper 内部的 seek 逻辑一致：窗口末尾可能被截断的最后一个分段丢弃，
+    下一个窗口从它的起点继续，并把上一窗口的文本作为提示保持上下文。
+    缓冲区最多保留一个窗口的音频。
+    """
+    import numpy as np
+    window = int(window_seconds * SAMPLE_RATE)
+    chunks = iter(chunks)
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = 0.0  # buffer[0] 在整段音频中的时间（秒）
+    ended = False
+    segments: List[Dict[str, Any]] = []
+
+    while True:
+        while not ended and len(buffer) < window:
+            try:
+                buffer = np.concatenate([buffer, next(chunks)])
+            except StopIteration:
+                ended = True
+        if not len(buffer):
+            break
+
+        piece = buffer[:window]
+        is_last = ended and len(buffer) <= window
+        new = [
+            {**seg, "start": seg["start"] + offset, "end": seg["end"] + offset}
+            for seg in decode(piece, prompt)
+        ]
+        if not is_last and len(new) > 1:
+            # 最后一段可能跨越窗口边界，留给下一窗口重新解码
+            seek = int((new[-1]["start"] - offset) * SAMPLE_RATE)
+            new = new[:-1]
+        else:
+            seek = len(piece)
+
+        if new:
+            segments.extend(new)
+            on_segments(new)
+            prompt = "".join(seg["text"] for seg in new)[-200:]
+        seek = max(seek, min(SAMPLE_RATE, len(buffer)))
+        buffer = buffer[seek:]
+        offset += seek / SAMPLE_RATE
+
+    return {
+        "text": "".join(seg["text"] for seg in segments),
+        "segments": segments,
+        "duration": offset,
+    }
+
+
+def write_segments_txt(result: Dict[str, Any], txt_path: Path):
+    """按 whisper CLI 的 txt 格式写出结果（每个分段一行）"""
+    lines = [seg["text"].strip() for seg in result.get("segments", [])]
+    Path(txt_path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def _srt_timestamp(seconds: float) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def write_segments_srt(result: Dict[str, Any], srt_path: Path):
+    """按 whisper CLI 的 srt 格式写出结果"""
+    blocks = [
+        f"{i}\n{_srt_timestamp(seg['start'])} --> {_srt_timestamp(seg['end'])}\n{seg['text'].strip()}\n"
+        for i, seg in enumerate(result.get("segments", []), 1)
+    ]
+    Path(srt_path).write_text("\n".join(blocks), encoding="utf-8")